@@ -0,0 +1,152 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import sys
+import ast
+import json
+import timeit
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import numpy
+from SciDice.Main import Dice
+
+#Usage: python -m SciDice.Benchmarks [--quick] [--output <File>] [--baseline <File>] [--tolerance <Ratio>]
+#Times every sampling strategy supported by each pattern of the sweep side by side and records the memory peak of one call.
+#The time and memory it takes to import the package and roll a first pattern in a new interpreter are recorded as well.
+#Results are written as JSON and can be compared against a previously saved run to flag regressions.
+
+#Distribution suffixes as a function of Faces: narrow and wide normal distributions (few vs many rejections), exponential and rotated exponential
+Distributions = {'Uniform': lambda Faces: '',
+                 'NarrowNormal': lambda Faces: '~n('+str(Faces/10.0)+')',
+                 'WideNormal': lambda Faces: '~n('+str(Faces*2.0)+')',
+                 'Exponential': lambda Faces: '~e('+str(5.0/Faces)+')',
+                 'RotatedExponential': lambda Faces: '~re('+str(5.0/Faces)+')'}
+
+def GetPatterns(Quick=False):
+    RollsSweep = ((1, 100, 10000) if Quick else (1, 10, 1000, 100000, 1000000))
+    FacesSweep = ((6, 100) if Quick else (6, 20, 100, 1000))
+    KeepSweep = (('', ':>3') if Quick else ('', ':>3', ':<3'))
+    Patterns = []
+    for DistributionName in sorted(Distributions):
+        for Rolls in RollsSweep:
+            for Faces in FacesSweep:
+                for Keep in KeepSweep:
+                    if Keep != '' and Rolls < 3:
+                        continue
+                    for NoSum in ('', '\\'):
+                        Patterns.append(NoSum+str(Rolls)+'d'+str(Faces)+Keep+Distributions[DistributionName](Faces))
+    return Patterns
+
+def _TimeCall(Function, MinimumTime):
+    Timer = timeit.Timer(Function)
+    Number, Elapsed = Timer.autorange()
+    while Elapsed < MinimumTime:
+        Number *= 2
+        Elapsed = Timer.timeit(Number)
+    return Elapsed/Number
+
+def _PeakMemory(Function):
+    tracemalloc.start()
+    try:
+        Function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+_ColdStartCode = '''
+import sys, time, tracemalloc
+if %(Trace)s:
+    tracemalloc.start()
+Start = time.perf_counter()
+import SciDice
+SciDice.Dice(%(Pattern)r).GenerateRolls()
+Elapsed = time.perf_counter()-Start
+print(repr((Elapsed, tracemalloc.get_traced_memory()[1] if %(Trace)s else 0, 'scipy' in sys.modules)))
+'''
+
+def _RunColdStart(Pattern, Trace):
+    Output = subprocess.check_output([sys.executable, '-c', _ColdStartCode % {'Pattern': Pattern, 'Trace': Trace}])
+    return ast.literal_eval(Output.decode('ascii'))
+
+#Result in the same format as those of RunBenchmarks for importing the package and rolling Pattern once in a new interpreter (best of Repeat runs).
+#Memory is traced in a separate run since tracing slows down imports. ImportsScipy tells whether scipy was loaded along the way.
+def MeasureColdStart(Pattern='3d6', Repeat=3):
+    Seconds = min(_RunColdStart(Pattern, False)[0] for Run in range(Repeat))
+    Elapsed, PeakBytes, ImportsScipy = _RunColdStart(Pattern, True)
+    return {'Pattern': Pattern, 'Strategy': '', 'Method': 'ColdStart', 'SecondsPerCall': Seconds, 'PeakBytes': PeakBytes, 'ImportsScipy': ImportsScipy}
+
+#Each result measures one method for one pattern and strategy: the raw sampler (_GenerateRoll<Strategy> or _GenerateRolls<Strategy>) and GenerateRolls, 
+#which adds the :<|> and sum processing on top of it
+def RunBenchmarks(Patterns, MinimumTime=0.2, Seed=0):
+    Results = []
+    for Pattern in Patterns:
+        Reference = Dice(Pattern)
+        for Strategy in Dice._SupportedStrategies[Reference.Distribution]:
+            Instance = Dice(Pattern, Strategy=Strategy, Seed=Seed)
+            Sampler = ('_GenerateRoll' if Instance.Rolls == 1 else '_GenerateRolls')+Strategy
+            for Method, Function in ((Sampler, getattr(Instance, Sampler)), ('GenerateRolls', Instance.GenerateRolls)):
+                Results.append({'Pattern': Pattern, 'Strategy': Strategy, 'Method': Method, 
+                                'SecondsPerCall': _TimeCall(Function, MinimumTime), 'PeakBytes': _PeakMemory(Function)})
+    return {'Metadata': {'Python': platform.python_version(), 'Numpy': numpy.__version__, 'Platform': platform.platform()}, 'Results': Results}
+
+def _ResultKey(Result):
+    return (Result['Pattern'], Result['Strategy'], Result['Method'])
+
+#Returns the results of Current that are slower than their Baseline counterpart by more than the Tolerance ratio, with the ratio of the two timings
+def CompareResults(Current, Baseline, Tolerance=0.25):
+    BaselineResults = dict((_ResultKey(Result), Result) for Result in Baseline['Results'])
+    Regressions = []
+    for Result in Current['Results']:
+        Previous = BaselineResults.get(_ResultKey(Result))
+        if Previous is not None and Result['SecondsPerCall'] > Previous['SecondsPerCall']*(1.0+Tolerance):
+            Regressions.append(dict(Result, Ratio=Result['SecondsPerCall']/Previous['SecondsPerCall']))
+    return Regressions
+
+def main(Arguments=None):
+    Parser = argparse.ArgumentParser(prog='python -m SciDice.Benchmarks', description='Times SciDice sampling strategies over a sweep of patterns.')
+    Parser.add_argument('--quick', action='store_true', help='Smaller sweep, for a quick check.')
+    Parser.add_argument('--pattern', action='append', help='Benchmark this pattern instead of the sweep (can be repeated).')
+    Parser.add_argument('--output', help='File where the JSON results are written.')
+    Parser.add_argument('--baseline', help='JSON results of a previous run to compare against.')
+    Parser.add_argument('--tolerance', type=float, default=0.25, help='Slowdown ratio above which a result is flagged as a regression.')
+    Parser.add_argument('--min-time', type=float, default=0.2, help='Minimum time spent timing each method, in seconds.')
+    Parser.add_argument('--no-cold-start', action='store_true', help='Skip timing the import of the package in a new interpreter.')
+    Options = Parser.parse_args(Arguments)
+    Results = RunBenchmarks(Options.pattern or GetPatterns(Options.quick), Options.min_time)
+    if not Options.no_cold_start:
+        Results['Results'].insert(0, MeasureColdStart())
+    if Options.output:
+        with open(Options.output, 'w') as File:
+            json.dump(Results, File, indent=1)
+    for Result in Results['Results']:
+        print("%-28s %-10s %-24s %12.3e s %12d B" % (Result['Pattern'], Result['Strategy'], Result['Method'], Result['SecondsPerCall'], Result['PeakBytes']))
+    if Options.baseline:
+        with open(Options.baseline) as File:
+            Regressions = CompareResults(Results, json.load(File), Options.tolerance)
+        for Regression in Regressions:
+            print("REGRESSION: %s %s %s took %.2f times the baseline time" % (Regression['Pattern'], Regression['Strategy'], Regression['Method'], Regression['Ratio']))
+        return (1 if Regressions else 0)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import sys
+import numpy
+import numpy.lib.format
+from SciDice.Parallel import ParallelDice
+from SciDice.RandomStreams import GetGenerator, SpawnSeedSequences
+
+#Used by the bulk mode of SciDiceScript to write many trials of patterns to a file or a pipe in bounded memory.
+
+FORMATS = ('csv', 'raw', 'npy')
+
+#Patterns given as arguments followed by those of Source (a path or '-' for stdin), one per line. Blank lines and lines starting with '#' are skipped.
+def ReadPatterns(Arguments=(), Source=None):
+    Patterns = list(Arguments)
+    if Source is not None:
+        File = (sys.stdin if Source == '-' else open(Source))
+        try:
+            Patterns.extend(Line.strip() for Line in File if Line.strip() and not Line.lstrip().startswith('#'))
+        finally:
+            if File is not sys.stdin:
+                File.close()
+    return Patterns
+
+#Yields (Chunk, Complete) pairs where chunks are drawn from at most ChunkSize dice, so that memory depends neither on Count nor on the dice of a trial.
+#Trials with more dice than that are drawn one at a time, ChunkSize dice at a time: summed and :<|> patterns are reduced as the dice come and 
+#other patterns are yielded in parts (of shape (1, <Dice>)), the trial being Complete with the last one.
+#Each chunk of ChunkSize dice is split in 16 parts for the workers, independently of their number.
+def _IterTrials(Instance, Count, ChunkSize):
+    Instance.ChunkSize = max(1, ChunkSize//16)
+    if Instance.Dice.Rolls <= ChunkSize:
+        ChunkTrials = ChunkSize//Instance.Dice.Rolls
+        for Start in range(0, Count, ChunkTrials):
+            yield Instance.GenerateTrials(min(ChunkTrials, Count-Start)), True
+        return
+    for Trial in range(Count):
+        Chunks = Instance._IterRollChunks(ChunkSize)
+        if Instance.Dice.Sum or Instance.Dice.HighLowAmount > 0:
+            yield numpy.asarray(Instance.Dice._ReduceChunks(Chunks, Reduced=True))[None], True
+            continue
+        Part = next(Chunks)
+        for Next in Chunks:
+            yield Instance.Dice._CountSuccesses(Part)[None], False
+            Part = Next
+        yield Instance.Dice._CountSuccesses(Part)[None], True
+
+#Parts of a trial that are Continued go on the line of the previous part and the line is only ended once the trial is Complete
+def _FormatCsv(Chunk, Prefix, Continued=False, Complete=True):
+    if Continued or not(Complete):
+        return (',' if Continued else Prefix)+','.join(map(str, Chunk.ravel().tolist()))+('\n' if Complete else '')
+    if Chunk.ndim == 1:
+        Lines = map(str, Chunk.tolist())
+    else:
+        Lines = (','.join(map(str, Row)) for Row in Chunk.tolist())
+    return ''.join(Prefix+Line+'\n' for Line in Lines)
+
+def _Cast(Chunk, Dtype):
+    Result = Chunk.astype(Dtype)
+    if Chunk.size > 0 and (Chunk.max() > Result.max() or Chunk.min() < Result.min()):
+        raise ValueError("Rolls don't fit in the output type "+str(Dtype)+".")
+    return Result
+
+def WriteTrials(Patterns, Output, Count=1, Format='csv', Seed=None, Workers=1, ChunkSize=2**20, Dtype='<i8'):
+    """
+    Writes Count trials of each pattern of Patterns (in order) to the binary file object Output, drawing at most ChunkSize dice at a time.
+    
+    |-> csv: one line per trial (dice separated by commas for unsummed patterns). With several patterns, the first column is the index of the pattern.
+    |
+    |-> raw: the values as little-endian integers of type Dtype, trials of each pattern one after the other.
+    |
+    |-> npy: a .npy file of type Dtype, with shape (Count,)+<shape of a trial> for one pattern or (len(Patterns), Count)+<shape of a trial> 
+    |   for several, which must then all have the same trial shape.
+    |
+    |-> Trials are drawn with ParallelDice (in Workers processes), so for a given Seed the output doesn't depend on Workers.
+    """
+    if Format not in FORMATS:
+        raise ValueError("Format must be one of: "+', '.join(FORMATS)+".")
+    if Count < 0:
+        raise ValueError("Number of trials cannot be negative.")
+    Dtype = numpy.dtype(Dtype).newbyteorder('<')
+    if Dtype.kind not in 'iu':
+        raise ValueError("Output type must be an integer type.")
+    #Every pattern is parsed before anything is written, so that a typo doesn't leave a truncated output behind
+    Seeds = SpawnSeedSequences(GetGenerator(Seed), len(Patterns))
+    Instances = [ParallelDice(Pattern, Workers=Workers, Seed=Child) for Pattern, Child in zip(Patterns, Seeds)]
+    try:
+        if Format == 'npy':
+            Shapes = set(Instance.Dice.GenerateTrials(0).shape[1:] for Instance in Instances)
+            if len(Shapes) > 1:
+                raise ValueError("Patterns written to the same .npy file must have the same trial shape.")
+            Shape = (Count,)+(Shapes.pop() if Shapes else ())
+            if len(Instances) != 1:
+                Shape = (len(Instances),)+Shape
+            numpy.lib.format.write_array_header_1_0(Output, {'descr': numpy.lib.format.dtype_to_descr(Dtype), 'fortran_order': False, 'shape': Shape})
+        for Index, Instance in enumerate(Instances):
+            Prefix = (str(Index)+',' if len(Instances) > 1 else '')
+            Continued = False
+            for Chunk, Complete in _IterTrials(Instance, Count, ChunkSize):
+                if Format == 'csv':
+                    Output.write(_FormatCsv(Chunk, Prefix, Continued, Complete).encode('ascii'))
+                    Continued = not(Complete)
+                else:
+                    Output.write(_Cast(Chunk, Dtype).tobytes())
+    finally:
+        for Instance in Instances:
+            Instance.Close()
@@ -19,8 +19,8 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
+import math
 import numpy
-import scipy.stats as stats
 
 def RangeConditionalCdf(Distribution, Min=None, Max=None, **NameArgs):
     x = NameArgs['x']
@@ -42,6 +42,101 @@ def FromCdfToPdf(CdfArray):
     CdfMinus1[1:] = CdfArray[:-1]
     return CdfArray-CdfMinus1
 
+#Direct convolution is quadratic in the array sizes, so FFT convolution takes over once both arrays are large enough for it to pay off.
+#FFT round-off can produce tiny negative values in the tails, which are clipped to zero.
+def ConvolvePdfs(Pdf1, Pdf2):
+    if min(Pdf1.size, Pdf2.size) < 64:
+        return numpy.convolve(Pdf1, Pdf2)
+    Size = Pdf1.size+Pdf2.size-1
+    FftSize = 1 << (Size-1).bit_length()
+    Result = numpy.fft.irfft(numpy.fft.rfft(Pdf1, FftSize)*numpy.fft.rfft(Pdf2, FftSize), FftSize)[:Size]
+    Result[Result<0.0] = 0.0
+    return Result
+
+#Pdf of the sum of Amount independent draws from Pdf, with index i of the result corresponding to the sum of the indexes of the draws.
+#Uses exponentiation by squaring, so only O(log(Amount)) convolutions are performed.
+def SumPdf(Pdf, Amount):
+    Result = numpy.ones(1)
+    Power = Pdf
+    while Amount > 0:
+        if Amount & 1:
+            Result = ConvolvePdfs(Result, Power)
+        Amount >>= 1
+        if Amount > 0:
+            Power = ConvolvePdfs(Power, Power)
+    return Result
+
+#scipy.stats takes hundreds of milliseconds to import and is only needed by the exact distributions of kept dice, so it is imported the first time they are computed
+def _GetStats():
+    import scipy.stats
+    return scipy.stats
+
+#Cdf of order statistics of Amount independent draws over the discrete values 1..Cdf.size. 
+#Row i of the result is the Cdf of the Ranks[i]-th smallest draw (1-based): P(X(r) <= x) = P(at least r draws are <= x)
+def OrderStatisticsCdf(Cdf, Amount, Ranks):
+    Ranks = numpy.asarray(Ranks).reshape(-1, 1)
+    Result = _GetStats().binom.sf(Ranks-1, Amount, numpy.minimum(Cdf, 1.0).reshape(1, -1))
+    Result[:, -1] = 1.0
+    return Result
+
+#Pdf of the sum of the Keep highest (or lowest) of Amount independent draws over the discrete values 1..Pdf.size, with index i of the result being a sum of i.
+#Faces are visited from the most to the least favored one. Given that m dice were already assigned to previously visited faces, the remaining Amount-m
+#dice are independent draws conditioned on not being on those faces, so the number landing on the current face is binomial. Once Keep dice 
+#are assigned, the sum of the kept dice is fixed and the state is absorbed into the result.
+#The binomial probabilities of a face are computed in one call and the state is updated one count at a time for all amounts of assigned dice at once,
+#so it takes O(Keep*Faces) numpy operations on arrays of O(Keep^2*Faces) elements, for O(Keep^3*Faces^2) arithmetic in total.
+def KeptSumPdf(Pdf, Amount, Keep, Highest=True):
+    Binomial = _GetStats().binom
+    Values = numpy.arange(1, Pdf.size+1)
+    if Highest:
+        Order = Values[::-1]
+        Remainder = Pdf.cumsum()
+    else:
+        Order = Values
+        Remainder = Pdf[::-1].cumsum()[::-1]
+    Size = Keep*Pdf.size+1
+    State = numpy.zeros((Keep, Size))
+    State[0, 0] = 1.0
+    Result = numpy.zeros(Size)
+    Assigned = numpy.arange(Keep)
+    for Value in Order:
+        if Remainder[Value-1] <= 0.0:
+            continue
+        Probability = min(Pdf[Value-1]/Remainder[Value-1], 1.0)
+        #CountProbabilities[m, c] is the probability that c of the Amount-m remaining dice land on the face and Absorbed[m] that enough of them do
+        #to complete the Keep dice
+        CountProbabilities = Binomial.pmf(Assigned.reshape(1, -1), (Amount-Assigned).reshape(-1, 1), Probability)
+        Absorbed = Binomial.sf(Keep-Assigned-1, Amount-Assigned, Probability)
+        NewState = numpy.zeros((Keep, Size))
+        for Count in range(Keep):
+            Shift = Count*Value
+            NewState[Count:, Shift:] += CountProbabilities[:Keep-Count, Count].reshape(-1, 1)*State[:Keep-Count, :Size-Shift]
+        for Row in range(Keep):
+            Shift = (Keep-Row)*Value
+            Result[Shift:] += Absorbed[Row]*State[Row, :Size-Shift]
+        State = NewState
+    return Result
+
+#Alias table of Walker's alias method for the discrete distribution Pmf, built with Vose's algorithm in O(Pmf.size).
+#To sample, pick an index i uniformly and return i with probability Probabilities[i] and Aliases[i] otherwise.
+def AliasTable(Pmf):
+    Size = Pmf.size
+    Scaled = (Pmf*(Size/Pmf.sum())).tolist()
+    Aliases = list(range(Size))
+    Small = [Index for Index, Value in enumerate(Scaled) if Value < 1.0]
+    Large = [Index for Index, Value in enumerate(Scaled) if Value >= 1.0]
+    while Small and Large:
+        Less = Small.pop()
+        More = Large[-1]
+        Aliases[Less] = More
+        Scaled[More] -= 1.0-Scaled[Less]
+        if Scaled[More] < 1.0:
+            Small.append(Large.pop())
+    #Whatever is left is only off from 1.0 by round-off
+    for Index in Small+Large:
+        Scaled[Index] = 1.0
+    return numpy.array(Scaled), numpy.array(Aliases)
+
 class RotatedExponential(object):
 	@staticmethod
 	def cdf(x, loc, scale):
@@ -59,3 +154,178 @@ class Exponential(object):
 	def ppf(q, scale):
 		Lambda = (1.0/scale)
 		return -numpy.log(1-q)/Lambda
+	
+	@staticmethod
+	def cdf(x, scale):
+		Lambda = (1.0/scale)
+		return -numpy.expm1(-Lambda*numpy.maximum(x, 0.0))
+		
+class Normal(object):
+	#stats.norm.cdf and stats.norm.ppf have the same per call overhead as stats.expon.ppf and kept the quantile strategy from being competitive with the normal distribution.
+	#The cdf uses W. J. Cody's rational approximations of erfc (Math. Comp. 1969) and is accurate to double precision.
+	#The approximations are piecewise and each piece is written once for both scalars (evaluated with the math module, which is much faster than numpy on single values) and arrays.
+	_ErfA = (3.16112374387056560e00, 1.13864154151050156e02, 3.77485237685302021e02, 3.20937758913846947e03, 1.85777706184603153e-1)
+	_ErfB = (2.36012909523441209e01, 2.44024637934444173e02, 1.28261652607737228e03, 2.84423683343917062e03)
+	_ErfcC = (5.64188496988670089e-1, 8.88314979438837594e00, 6.61191906371416295e01, 2.98635138197400131e02, 8.81952221241769090e02,
+	          1.71204761263407058e03, 2.05107837782607147e03, 1.23033935479799725e03, 2.15311535474403846e-8)
+	_ErfcD = (1.57449261107098347e01, 1.17693950891312499e02, 5.37181101862009858e02, 1.62138957456669019e03, 3.29079923573345963e03,
+	          4.36261909014324716e03, 3.43936767414372164e03, 1.23033935480374942e03)
+	_ErfcP = (3.05326634961232344e-1, 3.60344899949804439e-1, 1.25781726111229246e-1, 1.60837851487422766e-2, 6.58749161529837803e-4, 1.63153871373020978e-2)
+	_ErfcQ = (2.56852019228982242e00, 1.87295284992346725e00, 5.27905102951428412e-1, 6.05183413124413191e-2, 2.33520497626869185e-3)
+	
+	#Evaluates Function(Values[Mask], numpy) for each (Mask, Function) piece, skipping the fancy indexing when a single piece covers all the values
+	@staticmethod
+	def _Piecewise(Values, Pieces):
+		for Mask, Function in Pieces:
+			if Mask.all():
+				return Function(Values, numpy)
+		Result = numpy.empty_like(Values)
+		for Mask, Function in Pieces:
+			if Mask.any():
+				Result[Mask] = Function(Values[Mask], numpy)
+		return Result
+	
+	#exp(-y*y) computed as exp(-r*r)*exp(-(y-r)*(y+r)) where r is y rounded down to a multiple of 1/16, which avoids the error of squaring y for large values
+	@staticmethod
+	def _ExpMinusSquare(y, Math):
+		r = Math.floor(y*16.0)/16.0
+		return Math.exp(-r*r)*Math.exp(-(y-r)*(y+r))
+	
+	#The three pieces of erfc(y) for y >= 0: 1-erf(y) below 0.46875, then erfc(y)*exp(y*y) up to 4, then its asymptotic expansion in 1/(y*y)
+	@classmethod
+	def _ErfcSmall(cls, y, Math):
+		Square = y*y
+		A, B = cls._ErfA, cls._ErfB
+		Numerator = (((A[4]*Square+A[0])*Square+A[1])*Square+A[2])*Square+A[3]
+		Denominator = (((Square+B[0])*Square+B[1])*Square+B[2])*Square+B[3]
+		return 1.0-y*Numerator/Denominator
+	
+	@classmethod
+	def _ErfcMedium(cls, y, Math):
+		C, D = cls._ErfcC, cls._ErfcD
+		Numerator = (((((((C[8]*y+C[0])*y+C[1])*y+C[2])*y+C[3])*y+C[4])*y+C[5])*y+C[6])*y+C[7]
+		Denominator = (((((((y+D[0])*y+D[1])*y+D[2])*y+D[3])*y+D[4])*y+D[5])*y+D[6])*y+D[7]
+		return cls._ExpMinusSquare(y, Math)*Numerator/Denominator
+	
+	@classmethod
+	def _ErfcLarge(cls, y, Math):
+		Inverse = 1.0/(y*y)
+		P, Q = cls._ErfcP, cls._ErfcQ
+		Numerator = ((((P[5]*Inverse+P[0])*Inverse+P[1])*Inverse+P[2])*Inverse+P[3])*Inverse+P[4]
+		Denominator = ((((Inverse+Q[0])*Inverse+Q[1])*Inverse+Q[2])*Inverse+Q[3])*Inverse+Q[4]
+		return cls._ExpMinusSquare(y, Math)*(0.56418958354775628695-Inverse*Numerator/Denominator)/y
+	
+	#Cdf of the standard normal distribution at -|z| (the lower tail), which keeps full relative precision far from the mean.
+	#Arrays of up to _ScalarLoopSize values go through the scalar version, since it costs less than the fixed cost of the numpy calls.
+	_ScalarLoopSize = 16
+	
+	@classmethod
+	def _LowerTail(cls, z):
+		if numpy.ndim(z) == 0:
+			y = abs(float(z))*0.70710678118654752440
+			if y != y:
+				return math.nan
+			if y <= 0.46875:
+				return 0.5*cls._ErfcSmall(y, math)
+			return 0.5*(cls._ErfcMedium(y, math) if y <= 4.0 else (cls._ErfcLarge(y, math) if y < 27.3 else 0.0))
+		if z.size <= cls._ScalarLoopSize:
+			return numpy.array([cls._LowerTail(Value) for Value in z.flat]).reshape(z.shape)
+		y = numpy.abs(z)*0.70710678118654752440
+		Small = y <= 0.46875
+		Large = y > 4.0
+		with numpy.errstate(under='ignore', over='ignore', invalid='ignore'):
+			Result = 0.5*Normal._Piecewise(y, ((Small, cls._ErfcSmall), (~(Small | Large), cls._ErfcMedium), (Large, cls._ErfcLarge)))
+		Result[numpy.isinf(y)] = 0.0
+		return Result
+	
+	@classmethod
+	def cdf(cls, x, loc=0.0, scale=1.0):
+		z = ((x if numpy.ndim(x) == 0 else numpy.asarray(x, dtype=float))-loc)/scale
+		Tail = cls._LowerTail(z)
+		if numpy.ndim(Tail) == 0:
+			return (1.0-Tail if z > 0.0 else Tail)
+		return numpy.where(z > 0.0, 1.0-Tail, Tail)
+	
+	#Wichura's algorithm AS241 (PPND16, Applied Statistics 1988): rational approximations in q-0.5 near the median and in sqrt(-log(p)) in the tails,
+	#accurate to about 1e-16 without any refinement step.
+	_PpfCentralNumerator = (2509.0809287301226727, 33430.575583588128105, 67265.770927008700853, 45921.953931549871457,
+	                        13731.693765509461125, 1971.5909503065514427, 133.14166789178437745, 3.387132872796366608)
+	_PpfCentralDenominator = (5226.495278852545925, 28729.085735721942674, 39307.89580009271061, 21213.794301586595867,
+	                          5394.1960214247511077, 687.1870074920579083, 42.313330701600911252, 1.0)
+	_PpfNearNumerator = (7.7454501427834140764e-4, 0.0227238449892691845833, 0.24178072517745061177, 1.27045825245236838258,
+	                     3.64784832476320460504, 5.7694972214606914055, 4.6303378461565452959, 1.42343711074968357734)
+	_PpfNearDenominator = (1.05075007164441684324e-9, 5.475938084995344946e-4, 0.0151986665636164571966, 0.14810397642748007459,
+	                       0.68976733498510000455, 1.6763848301838038494, 2.05319162663775882187, 1.0)
+	_PpfFarNumerator = (2.01033439929228813265e-7, 2.71155556874348757815e-5, 0.0012426609473880784386, 0.026532189526576123093,
+	                    0.29656057182850489123, 1.7848265399172913358, 5.4637849111641143699, 6.6579046435011037772)
+	_PpfFarDenominator = (2.04426310338993978564e-15, 1.4215117583164458887e-7, 1.8463183175100546818e-5, 7.868691311456132591e-4,
+	                      0.0148753612908506148525, 0.13692988092273580531, 0.59983220655588793769, 1.0)
+	
+	#Ratio of two polynomials of degree 7 given by their coefficients from the highest degree down. For arrays, both are evaluated at once 
+	#on a stacked array, which halves the number of numpy calls.
+	_StackedCoefficients = {}
+	
+	@staticmethod
+	def _Rational(x, Numerator, Denominator, Math):
+		if Math is math:
+			N = Numerator[0]*x+Numerator[1]
+			D = Denominator[0]*x+Denominator[1]
+			for Index in range(2, 8):
+				N = N*x+Numerator[Index]
+				D = D*x+Denominator[Index]
+			return N/D
+		Coefficients = Normal._StackedCoefficients.get((Numerator, Denominator))
+		if Coefficients is None:
+			Coefficients = Normal._StackedCoefficients[(Numerator, Denominator)] = list(numpy.array((Numerator, Denominator)).T.reshape(8, 2, 1))
+		Flat = x.reshape(1, -1)
+		Result = Coefficients[0]*Flat
+		Result += Coefficients[1]
+		for Index in range(2, 8):
+			Result *= Flat
+			Result += Coefficients[Index]
+		return (Result[0]/Result[1]).reshape(x.shape)
+	
+	#The tail piece works on the smaller of q and 1-q, computed from q directly so that tiny probabilities keep their precision, and gives infinities at 0 and 1
+	@classmethod
+	def _PpfCentral(cls, q, Math):
+		t = q-0.5
+		return t*cls._Rational(0.180625-t*t, cls._PpfCentralNumerator, cls._PpfCentralDenominator, Math)
+	
+	@classmethod
+	def _PpfTail(cls, q, Math):
+		if Math is math:
+			p = min(q, 1.0-q)
+			if p == 0.0:
+				return math.copysign(math.inf, q-0.5)
+			r = math.sqrt(-math.log(p))
+			if r <= 5.0:
+				z = cls._Rational(r-1.6, cls._PpfNearNumerator, cls._PpfNearDenominator, math)
+			else:
+				z = cls._Rational(r-5.0, cls._PpfFarNumerator, cls._PpfFarDenominator, math)
+		else:
+			r = numpy.sqrt(-numpy.log(numpy.minimum(q, 1.0-q)))
+			z = cls._Rational(r-1.6, cls._PpfNearNumerator, cls._PpfNearDenominator, numpy)
+			Far = r > 5.0
+			if Far.any():
+				z[Far] = cls._Rational(r[Far]-5.0, cls._PpfFarNumerator, cls._PpfFarDenominator, numpy)
+			z[r == numpy.inf] = numpy.inf
+		return Math.copysign(z, q-0.5)
+	
+	@classmethod
+	def ppf(cls, q, loc=0.0, scale=1.0):
+		if numpy.ndim(q) == 0:
+			q = float(q)
+			if not(0.0 <= q <= 1.0):
+				return math.nan
+			return loc+scale*(cls._PpfCentral(q, math) if abs(q-0.5) <= 0.425 else cls._PpfTail(q, math))
+		#The central piece is cheap and finite everywhere, so it is evaluated on all the values and only the tails are gathered and overwritten.
+		#Like in _LowerTail, a few tail values are cheaper to compute one by one than with numpy calls.
+		q = numpy.asarray(q, dtype=float)
+		z = cls._PpfCentral(q, numpy)
+		Tail = numpy.flatnonzero(~(numpy.abs(q-0.5) <= 0.425))
+		if Tail.size > cls._ScalarLoopSize:
+			with numpy.errstate(divide='ignore', invalid='ignore'):
+				z.flat[Tail] = cls._PpfTail(q.flat[Tail], numpy)
+		elif Tail.size > 0:
+			z.flat[Tail] = [(cls._PpfTail(Value, math) if 0.0 <= Value <= 1.0 else math.nan) for Value in q.flat[Tail].tolist()]
+		return loc+scale*z
@@ -0,0 +1,136 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import re
+import numpy
+from SciDice.Main import Dice
+from SciDice.RandomStreams import GetGenerator, SpawnGenerators
+
+class DiceExpression(object):
+    """
+    ----------------------------------------------------------------------------------------
+    |Usage: Instance = DiceExpression(<Expression>); Instance.GenerateRolls()               |
+    ----------------------------------------------------------------------------------------
+    |-> <Expression> combines summed dice terms (see Dice, without the '\\' prefix) and integer constants with '+', '-', '*' and parentheses.
+    |
+    |-> The expression is compiled once into a postfix plan. Every term is an independent roll, but identical terms share the same Dice instance 
+    |   and are drawn together in one call.
+    |
+    |   *****************Example****************
+    |   #Roll 3d6, 2d8 normally distributed around 4 and the best of one d20, then subtract 5
+    |   Attack = DiceExpression('3d6+2d8~n(4)+1d20:>1-5'); Attack.GenerateTrials(3)
+    |   Output: array([24, 17, 31])
+    """
+    _TokenRegex = re.compile('\\s*(?:(?P<Term>'+Dice._Term_exp+')|(?P<Constant>\\d+)|(?P<Operator>[-+*()]))')
+    
+    def __init__(self, Input, Seed=None):
+        self.GeneratorString = Input
+        self._Tokens = self._Tokenize(Input)
+        self._Position = 0
+        self._Patterns = []
+        self._Occurrences = []
+        self.Plan = []
+        self._ParseSum()
+        if self._Position < len(self._Tokens):
+            raise ValueError("Unparsable expression: unexpected '"+self._Tokens[self._Position][1]+"'.")
+        Generators = SpawnGenerators(GetGenerator(Seed), len(self._Patterns))
+        self.Terms = [Dice(Pattern, Seed=Generator) for Pattern, Generator in zip(self._Patterns, Generators)]
+        del self._Tokens
+    
+    def _Tokenize(self, Input):
+        Tokens = []
+        Position = 0
+        while Position < len(Input.rstrip()):
+            Match = self._TokenRegex.match(Input, Position)
+            if Match is None:
+                raise ValueError("Unparsable expression: unexpected character at position "+str(Position)+".")
+            Tokens.append((Match.lastgroup, Match.group(Match.lastgroup)))
+            Position = Match.end()
+        return Tokens
+    
+    def _Peek(self):
+        return (self._Tokens[self._Position] if self._Position < len(self._Tokens) else (None, None))
+    
+    #Recursive descent parser emitting the plan in postfix order: Sum := Product (('+'|'-') Product)*, Product := Factor ('*' Factor)*
+    def _ParseSum(self):
+        self._ParseProduct()
+        while self._Peek()[1] in ('+', '-'):
+            Operator = self._Peek()[1]
+            self._Position += 1
+            self._ParseProduct()
+            self.Plan.append((Operator, None))
+    
+    def _ParseProduct(self):
+        self._ParseFactor()
+        while self._Peek()[1] == '*':
+            self._Position += 1
+            self._ParseFactor()
+            self.Plan.append(('*', None))
+    
+    def _ParseFactor(self):
+        Kind, Text = self._Peek()
+        self._Position += 1
+        if Kind == 'Term':
+            if Text not in self._Patterns:
+                self._Patterns.append(Text)
+                self._Occurrences.append(0)
+            Index = self._Patterns.index(Text)
+            self.Plan.append(('Term', (Index, self._Occurrences[Index])))
+            self._Occurrences[Index] += 1
+        elif Kind == 'Constant':
+            self.Plan.append(('Constant', int(Text)))
+        elif Text == '-':
+            self._ParseFactor()
+            self.Plan.append(('Negate', None))
+        elif Text == '(':
+            self._ParseSum()
+            if self._Peek()[1] != ')':
+                raise ValueError("Unparsable expression: missing ')'.")
+            self._Position += 1
+        else:
+            raise ValueError("Unparsable expression: unexpected "+("end of expression" if Text is None else "'"+Text+"'")+".")
+    
+    #Every occurrence of a term in the expression is an independent roll, so a term used Count times is drawn Count*Trials times in a single call
+    def GenerateTrials(self, Trials):
+        if Trials < 0:
+            raise ValueError("Number of trials cannot be negative.")
+        Draws = [Term.GenerateTrials(Trials*Count).reshape(Count, Trials) for Term, Count in zip(self.Terms, self._Occurrences)]
+        Stack = []
+        for Operation, Argument in self.Plan:
+            if Operation == 'Term':
+                Stack.append(Draws[Argument[0]][Argument[1]])
+            elif Operation == 'Constant':
+                Stack.append(numpy.full(Trials, Argument, dtype=int))
+            elif Operation == 'Negate':
+                Stack.append(-Stack.pop())
+            else:
+                Right = Stack.pop()
+                Left = Stack.pop()
+                if Operation == '+':
+                    Stack.append(Left+Right)
+                elif Operation == '-':
+                    Stack.append(Left-Right)
+                else:
+                    Stack.append(Left*Right)
+        return Stack.pop()
+    
+    def GenerateRolls(self):
+        return self.GenerateTrials(1)[0]
@@ -0,0 +1,80 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import time
+import numpy
+
+class Instrumentation(object):
+    """
+    Counters and timings of the stages of a Dice instance (see Dice.EnableInstrumentation).
+    
+    |-> Stages are timed by wrapping the methods that implement them, so an instance that isn't instrumented doesn't pay anything for it.
+    |
+    |-> Callback, if set, is called as Callback(Instance, Stage, Seconds, Size) after each timed call, where Size is the number of values it returned.
+    """
+    STAGES = ('Tables', 'Sampling', 'Selection', 'Summing')
+    
+    def __init__(self, Instance, Callback=None):
+        self.Instance = Instance
+        self.Callback = Callback
+        self.Reset()
+    
+    def Reset(self):
+        self.Calls = dict((Stage, 0) for Stage in self.STAGES)
+        self.Seconds = dict((Stage, 0.0) for Stage in self.STAGES)
+        self.Samples = 0
+        self.Rejected = 0
+        self.RejectionIterations = 0
+    
+    def Record(self, Stage, Seconds, Size):
+        self.Calls[Stage] += 1
+        self.Seconds[Stage] += Seconds
+        if Stage == 'Sampling':
+            self.Samples += Size
+        if self.Callback is not None:
+            self.Callback(self.Instance, Stage, Seconds, Size)
+    
+    #Called by the rejection samplers: Rejected samples had to be redrawn over Iterations passes of the rejection loop
+    def CountRejections(self, Rejected, Iterations):
+        self.Rejected += Rejected
+        self.RejectionIterations += Iterations
+    
+    def Wrap(self, Stage, Function):
+        Clock = time.perf_counter
+        def Timed(*Arguments, **Options):
+            Start = Clock()
+            Result = Function(*Arguments, **Options)
+            self.Record(Stage, Clock()-Start, numpy.size(Result))
+            return Result
+        return Timed
+    
+    #AcceptanceRate is the fraction of the samples drawn by the rejection loop that were kept. It should be close to ExpectedAcceptanceRate, 
+    #the mass of the underlying distribution inside 0..Faces (UniformGeneratorRange), which is None for the uniform distribution.
+    def GetStats(self):
+        Instance = self.Instance
+        Stats = {'Pattern': Instance.GeneratorString, 'Strategy': Instance.Strategy, 'ConstructionSeconds': Instance._ConstructionSeconds,
+                 'Samples': self.Samples, 'Rejected': self.Rejected, 'Draws': self.Samples+self.Rejected, 'RejectionIterations': self.RejectionIterations,
+                 'AcceptanceRate': (self.Samples/float(self.Samples+self.Rejected) if self.Samples+self.Rejected > 0 else None),
+                 'ExpectedAcceptanceRate': (None if Instance.UniformGeneratorRange is None else float(Instance.UniformGeneratorRange[1]-Instance.UniformGeneratorRange[0]))}
+        for Stage in self.STAGES:
+            Stats[Stage+'Calls'] = self.Calls[Stage]
+            Stats[Stage+'Seconds'] = self.Seconds[Stage]
+        return Stats
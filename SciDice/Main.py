@@ -20,16 +20,23 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 import numpy
-import scipy.stats as stats
 import re
+import time
+import timeit
 from SciDice.CustomDistributions import *
+from SciDice.PatternCache import PatternCache
+from SciDice.RandomStreams import GetGenerator, SpawnGenerators
+from SciDice.Reducers import RunningSum, RunningKeep
+from SciDice.Selection import SelectExtremes
+from SciDice.Instrumentation import Instrumentation
         
 class Dice(object):
     """
     -------------------------------------------------------------
     |Usage: Instance = Dice(<Pattern>); Instance.GenerateRolls()|
     -------------------------------------------------------------
-    |-> <Patterns> is a string that takes the form: [\\]<Rolls>d<Faces>[:<<Amount>|><Amount>][~n(<NormalMean>,<NormalSD>)|~n(<NormalSD>)]
+    |-> <Patterns> is a string that takes the form:
+    |   [\\]<Rolls>d<Faces>[!][r<<Threshold>][:<<Amount>|><Amount>][#<Comparison><Target>][~n(<NormalMean>,<NormalSD>)|~n(<NormalSD>)]
     |
     |-> '\\': If present will keep the results of the dice rolls separate in an array, otherwise will sum them up into a scalar.
     |
@@ -38,29 +45,112 @@ class Dice(object):
     |-> ':<<Amount>|><Amount>': If present, Amount is an integer indicating the number of dice to keep. If preceded by ':>', the top <Amount> dice 
     |   will be kept and if preceded by ':<', the bottom <Amount> dice will be kept. Result will be a sorted array.
     |
+    |-> '!': If present, dice landing on <Faces> explode: another die is rolled and added to them, which can explode in turn.
+    |
+    |-> 'r<<Threshold>': If present, dice landing below <Threshold> are rerolled until they land on <Threshold> or more (this applies to the dice
+    |   added by explosions as well).
+    |
+    |-> '#<Comparison><Target>': If present, each (kept) die is replaced by 1 if it is a success and 0 otherwise, so summed patterns count the
+    |   successes. <Comparison> is one of '>=', '>', '<=', '<' or '=' and a die is a success if <Die><Comparison><Target>.
+    |
+    |-> Exploding dice, rerolls and success counting only work in Dice.DIRECT_MODE and not with the methods that are computed from the distribution
+    |   of the die rather than by rolling dice (GetResultDistribution, GenerateFaceCounts and GenerateNumberRollsInRange).
+    |
     |-> By default, each potential die value X has as their pdf the area (X-1,X) under u(0,<Faces>).
     |
     |-> '~n(<NormalMean>,<NormalSD>)|~n(<NormalSD>)':  If present, the cdf used will be a domain-adjusted (ie, 0 to <Faces>) variant of 
     |   n(<NormalMean>,<NormalSD>), with <NormalMean> defaulting to <Faces>/2 if omitted.
+    |
+    |-> The optional Strategy constructor argument picks how dice are sampled (Dice.BASIC_STRATEGY, Dice.TRIAL_ERROR_STRATEGY, Dice.QUANTILE_STRATEGY
+    |   or Dice.CDF_SEARCH_STRATEGY). Dice.CDF_SEARCH_STRATEGY works with every distribution and never rejects samples. By default (Dice.AUTO_STRATEGY), 
+    |   the cheapest one is selected from a cost model (see SelectStrategy and CalibrateStrategies) and can be inspected with the Strategy attribute.
+    |
+    |-> The optional Mode constructor argument can be set to Dice.HISTOGRAM_MODE to derive summed and :<|> results from per-face counts
+    |   (see GenerateFaceCounts), which makes their cost independent of <Rolls>. With Dice.SUM_TABLE_MODE, summed patterns draw their total
+    |   directly from the exact distribution of the sum (see GetResultDistribution) in constant time. Dice.APPROXIMATE_SUM_MODE does the same, but 
+    |   falls back to a normal approximation of the sum when its table would be too large, in which case the ApproximatedSum attribute is True.
+    |
+    |-> The optional Seed constructor argument (an integer, a numpy.random.SeedSequence or a numpy.random.Generator) makes the rolls of the instance
+    |   reproducible. Each instance draws from its own generator; use Spawn to get independent copies for other threads or processes.
     |   
     |   *****************Example****************
     |   #Roll ten 20-sided dice that are normally distributed with mean 10.0 and sd 6.6, return the 3 highest in an array
     |   Best3GroupOf10AttackRolls = Dice(r'\\10d20:>3~n(10.0,6.6)'); Best3GroupOf10AttackRolls.GenerateRolls()
     |   Output: array([18, 17, 14])
+    |
+    |   #Roll ten exploding 10-sided dice, rerolling the 1s, and count the dice that are 8 or more
+    |   Successes = Dice('10d10!r<2#>=8'); Successes.GenerateRolls()
+    |   Output: 4
     """
-    _Positive_simple_double_exp = '\d+(?:[.]\d+)?'
+    _Positive_simple_double_exp = r'\d+(?:[.]\d+)?'
     _Simple_double_exp = '[-]?' + _Positive_simple_double_exp
     _Normal_exp = '(?:~n[(](?:(?P<NormalMean>'+_Simple_double_exp+')[,])?(?P<NormalSD>'+_Positive_simple_double_exp+')[)])'
     _Exp_exp = '(?:~e[(](?P<ExpLambda>'+_Positive_simple_double_exp+')[)])' #Exp_exp :P
     _Rexp_exp = '(?:~re[(](?P<RotExpLambda>'+_Positive_simple_double_exp+')[)])'
     _Distributions_exp = "(?:"+_Normal_exp+"|"+_Exp_exp+"|"+_Rexp_exp+")"
-    _DiceRegex = re.compile('^(?P<NoSum>\\\\)?(?P<Rolls>\d+)d(?P<Faces>\d+)(?:[:](?P<Ascending><|>)(?P<HighLowAmount>\d+))?'+_Distributions_exp+'?$')
+    _Mechanics_exp = r'(?P<Explode>!)?(?:r<(?P<RerollBelow>\d+))?'
+    _Successes_exp = r'(?:#(?P<SuccessComparison>>=|<=|>|<|=)(?P<SuccessTarget>\d+))?'
+    _Term_exp = r'(?P<Rolls>\d+)d(?P<Faces>\d+)'+_Mechanics_exp+r'(?:[:](?P<Ascending><|>)(?P<HighLowAmount>\d+))?'+_Successes_exp+_Distributions_exp+'?'
+    _DiceRegex = re.compile('^(?P<NoSum>\\\\)?'+_Term_exp+'$')
     UNIFORM_DIST = 0
     NORMAL_DIST = 1
     EXPONENTIAL_DIST = 2
     ROTATED_EXPONENTIAL_DIST = 3
+    #Sampling strategies, each matching a _GenerateRoll<Strategy>/_GenerateRolls<Strategy> pair of methods
+    BASIC_STRATEGY = 'Basic'
+    TRIAL_ERROR_STRATEGY = 'TrialError'
+    QUANTILE_STRATEGY = 'Quantile'
+    CDF_SEARCH_STRATEGY = 'CdfSearch'
+    #Picks one of the above with SelectStrategy
+    AUTO_STRATEGY = 'Auto'
+    #Output modes. In histogram mode, summed or :<|> patterns are derived from per-face counts drawn from a multinomial instead of from individual dice
+    DIRECT_MODE = 'Direct'
+    HISTOGRAM_MODE = 'Histogram'
+    #Summed patterns draw their total from a table of the distribution of the sum instead of drawing dice, falling back to the dice when the table 
+    #would be too large. The approximate variant falls back to a normal approximation of the sum instead (for patterns that keep all their dice).
+    SUM_TABLE_MODE = 'SumTable'
+    APPROXIMATE_SUM_MODE = 'ApproximateSum'
+    #Limits on the tables of the sum modes: the amount of entries in the table and the time it takes to build the table of a :<|> pattern with 
+    #KeptSumPdf (estimated from _KeptSumCosts), which is kept around the cost of drawing a few thousand trials of such patterns directly
+    MaxSumTableSize = 2**20
+    MaxKeptSumSeconds = 0.05
+    _PatternCache = PatternCache(1024)
+    _TableStore = None
+    _Instrumentation = None
+    #Methods that instances rebind (see _BindStrategy and EnableInstrumentation), so clones must bind their own
+    _BoundMethods = ('_GenerateRoll', '_GenerateRolls', '_GenerateBlock', '_GenerateBaseRolls', '_GenerateSums', 'GenerateFaceCounts', '_KeepRolls', '_SumRolls', 
+                     '_GenerateRangeConditionalDistributions', '_Instrumentation')
+    _InstrumentedStages = (('_GenerateSums', 'Sampling'), ('GenerateFaceCounts', 'Sampling'), ('_KeepRolls', 'Selection'), ('_SumRolls', 'Summing'), 
+                           ('_GenerateRangeConditionalDistributions', 'Tables'))
+    _SupportedStrategies = {UNIFORM_DIST: (BASIC_STRATEGY, CDF_SEARCH_STRATEGY),
+                            NORMAL_DIST: (TRIAL_ERROR_STRATEGY, QUANTILE_STRATEGY, CDF_SEARCH_STRATEGY),
+                            EXPONENTIAL_DIST: (TRIAL_ERROR_STRATEGY, QUANTILE_STRATEGY, CDF_SEARCH_STRATEGY),
+                            ROTATED_EXPONENTIAL_DIST: (QUANTILE_STRATEGY, CDF_SEARCH_STRATEGY)}
+    #Cost model of the strategies, in seconds: (fixed cost per call or per rejection loop iteration, cost per die, cost of a single roll with _GenerateRoll).
+    #The cost per die of CdfSearch is per level of its binary search, which has log2(Faces+1) levels (see _GetSearchLevels).
+    #Measured with CalibrateStrategies on a reference machine. Calling CalibrateStrategies replaces them with measurements on the current machine for the whole process.
+    _StrategyCosts = {(UNIFORM_DIST, BASIC_STRATEGY): (8.0e-06, 4.3e-09, 2.9e-06),
+                      (UNIFORM_DIST, CDF_SEARCH_STRATEGY): (6.7e-06, 1.3e-08, 4.4e-06),
+                      (NORMAL_DIST, TRIAL_ERROR_STRATEGY): (1.2e-05, 3.8e-08, 1.3e-06),
+                      (NORMAL_DIST, QUANTILE_STRATEGY): (1.0e-04, 7.0e-08, 6.6e-06),
+                      (NORMAL_DIST, CDF_SEARCH_STRATEGY): (7.2e-06, 1.1e-08, 5.3e-06),
+                      (EXPONENTIAL_DIST, TRIAL_ERROR_STRATEGY): (1.1e-05, 3.0e-08, 1.4e-06),
+                      (EXPONENTIAL_DIST, QUANTILE_STRATEGY): (1.1e-05, 1.7e-08, 3.3e-06),
+                      (EXPONENTIAL_DIST, CDF_SEARCH_STRATEGY): (8.0e-06, 1.2e-08, 5.1e-06),
+                      (ROTATED_EXPONENTIAL_DIST, QUANTILE_STRATEGY): (7.8e-06, 1.6e-08, 3.4e-06),
+                      (ROTATED_EXPONENTIAL_DIST, CDF_SEARCH_STRATEGY): (6.0e-06, 1.2e-08, 4.4e-06)}
+    #Cost of building the Cdf table: (fixed cost, cost per face). It is charged in full to the CdfSearch strategy of an instance that doesn't have it yet so 
+    #that light instances stay light unless the rolls are large enough to make up for it, which huge dice (ie, a d10000000) never are
+    _TableCost = (1.0e-04, 6.0e-08)
+    #Cost model of KeptSumPdf, in seconds: (cost per face, per numpy operation and per element updated), measured on the same reference machine.
+    #It makes Faces scipy calls, 2*Faces*Kept numpy operations and updates Faces**2*Kept**3 elements.
+    _KeptSumCosts = (9.0e-05, 2.1e-05, 1.0e-09)
+    _CalibratedStrategies = False
+    #Comparisons of success counting, applied to the dice and the target of '#<Comparison><Target>'
+    _SuccessComparisons = {'>=': numpy.greater_equal, '>': numpy.greater, '<=': numpy.less_equal, '<': numpy.less, '=': numpy.equal}
     
-    def __init__(self, Input, LightConstructor=True):
+    def __init__(self, Input, LightConstructor=True, Strategy=None, Mode=None, Seed=None):
+        Start = time.perf_counter()
         Match = Dice._DiceRegex.match(Input)
         if Match==None:
             raise ValueError("Unparsable constructor string.")
@@ -72,78 +162,408 @@ class Dice(object):
         self.HighLowAmount = (int(Match.group('HighLowAmount')) if Match.group('HighLowAmount')!=None else 0)
         if self.HighLowAmount > self.Rolls:
             raise ValueError("Retained rolls cannot be greater than number of rolls.")
+        self.Explode = Match.group('Explode') != None
+        #Rerolling the dice below 1 is the same as not rerolling them
+        self.RerollBelow = (int(Match.group('RerollBelow')) if Match.group('RerollBelow') != None and int(Match.group('RerollBelow')) > 1 else 0)
+        self.SuccessComparison = Match.group('SuccessComparison')
+        self.SuccessTarget = (int(Match.group('SuccessTarget')) if self.SuccessComparison != None else None)
+        self.PoolMechanics = self.Explode or self.RerollBelow > 0 or self.SuccessComparison != None
         self.UniformGeneratorRange = None
         if Match.group('NormalSD')!=None:
             self.Distribution = self.NORMAL_DIST
             #Empirically, _GenerateRollTrialError was shown to yield the best overall performance.
             #_GenerateRollCdfSearch is faster in cases where NormalSD is large due to the higher number of misses, but the distribution approaches that found in the uniform distribution over the range of interest in those cases so it's unlikely to see much use.
             #_GenerateRollQuantile should theorically be the fastest, but isn't due to the time it takes to compute stats.norm.ppf, probably because the cdf of the normal distribution and it's inverse are not analytically tractable
-            self._GenerateRoll = self._GenerateRollTrialError
+            #CustomDistributions.Normal now computes them with rational approximations in numpy, which removes most of that cost
             #Interestingly, _GenerateRollsQuantile netted up to ~20% speed improvement on my tests with 10000 Rolls or more on d10~n(5,5), but was significantly slow in the lower ranges
             #With d10~n(5,3), _GenerateRollsTrialError was still faster though even with 10000000 rolls due to fewer misses.
             #_GenerateRollsTrialError is more consistant I find and better in usual scenarios (smaller SD and/or smaller number of rolls)
-            self._GenerateRolls = self._GenerateRollsTrialError
+            #These tradeoffs are now captured by the cost model used by SelectStrategy, which picks the strategy per pattern.
             self.SD = float(Match.group('NormalSD'))
             if self.SD==0.0:
                 raise ValueError("Standard deviation cannot be zero.")
             self.Mean = (float(self.Faces)/2.0 if Match.group('NormalMean') == None else float(Match.group('NormalMean')))
-            self.UniformGeneratorRange = stats.norm.cdf(numpy.array([0.0, float(self.Faces)]), loc=self.Mean, scale=self.SD)
+            self.UniformGeneratorRange = Normal.cdf(numpy.array([0.0, float(self.Faces)]), loc=self.Mean, scale=self.SD)
         elif Match.group('ExpLambda')!=None:
             self.Distribution = self.EXPONENTIAL_DIST
-            self._GenerateRoll = self._GenerateRollTrialError
-            self._GenerateRolls = self._GenerateRollsTrialError
             self.Lambda = float(Match.group('ExpLambda'))
             if self.Lambda==0.0:
                 raise ValueError("Lambda cannot be zero.")
-            self.UniformGeneratorRange = stats.expon.cdf(numpy.array([0.0, float(self.Faces)]), scale=1.0/self.Lambda)
+            self.UniformGeneratorRange = Exponential.cdf(numpy.array([0.0, float(self.Faces)]), scale=1.0/self.Lambda)
         elif Match.group('RotExpLambda')!=None:
             self.Distribution = self.ROTATED_EXPONENTIAL_DIST
-            self._GenerateRoll = self._GenerateRollQuantile
-            self._GenerateRolls = self._GenerateRollsQuantile
             self.Lambda = float(Match.group('RotExpLambda'))
             if self.Lambda==0.0:
                 raise ValueError("Lambda cannot be zero.")
             self.UniformGeneratorRange = RotatedExponential.cdf(numpy.array([0.0, float(self.Faces)]), loc=float(self.Faces), scale=1.0/self.Lambda)
         else:
             self.Distribution = self.UNIFORM_DIST
-            self._GenerateRoll = self._GenerateRollBasic
-            self._GenerateRolls = self._GenerateRollsBasic
+        #Dice are sampled from the part of the distribution that lies in 0..Faces, so there must be one
+        if self.UniformGeneratorRange is not None and not(self.UniformGeneratorRange[1] > self.UniformGeneratorRange[0]):
+            raise ValueError("Distribution "+self._GetDistributionString()+" has no probability mass over the faces of the dice (0 to "+str(self.Faces)+").")
 
-        self.Pdf, self.Cdf = None, None 
+        #Precomputed tables (Pdf, Cdf, result distribution, etc). Instances obtained from Dice.FromCache share this dictionary, so tables are computed once per pattern
+        self._Tables = {'Pdf': None, 'Cdf': None}
         #Mostly intended for potential future optimization with the analytically non-tractable normal distribution in the instance where we are interested in the number of rolls falling inside a range of values and the same object is re-used a lot to do it
+        #(see GenerateNumberRollsInRange)
         if not(LightConstructor): 
             self._GenerateRangeConditionalDistributions()
+        if self.Explode or self.RerollBelow > 0:
+            self._CheckRedraws()
+        self.Random = GetGenerator(Seed)
+        self.LowMemory = False
+        self.RollsDtype = numpy.dtype(int)
+        self._SampleDtype = numpy.dtype(float)
+        self._Buffer = None
+        self.SetStrategy(self.AUTO_STRATEGY if Strategy is None else Strategy)
+        self.SetMode(self.DIRECT_MODE if Mode is None else Mode)
+        self._ConstructionSeconds = time.perf_counter()-Start
+    
+    @classmethod
+    def FromCache(cls, Input, LightConstructor=True, Strategy=None, Mode=None, Seed=None):
+        """
+        Same as Dice(Input, LightConstructor, Strategy, Mode, Seed), but the parsed pattern and its precomputed tables are kept in a bounded LRU cache and shared 
+        (read-only) by all instances of the same pattern, making construction a dictionary lookup for frequently used patterns.
+        """
+        Prototype = cls._PatternCache.Get(Input)
+        if Prototype is None:
+            Prototype = cls(Input)
+            #Differently written patterns that parse to the same thing (ie, '4d8~n(3)' and '4d8~n(4.0,3.0)') share the same tables
+            NormalizedPattern = Prototype._GetNormalizedPattern()
+            Prototype = cls._PatternCache.Get(NormalizedPattern, CountStats=False) or Prototype
+            cls._PatternCache.Put(NormalizedPattern, Prototype)
+            cls._PatternCache.Put(Input, Prototype)
+        Instance = Prototype._Clone(GetGenerator(Seed))
+        Instance.GeneratorString = Input
+        if not(LightConstructor) and Instance.Pdf is None:
+            Instance._GenerateRangeConditionalDistributions()
+        if Strategy is not None:
+            Instance.SetStrategy(Strategy)
+        if Mode is not None:
+            Instance.SetMode(Mode)
+        return Instance
+    
+    #New instance sharing the parsed pattern, options and tables of this one, but drawing from its own random generator
+    def _Clone(self, Random):
+        Instance = self.__class__.__new__(self.__class__)
+        Instance.__dict__.update((Key, Value) for Key, Value in self.__dict__.items() if Key not in self._BoundMethods)
+        Instance.Random = Random
+        Instance._BindStrategy(self.Strategy)
+        if self._Buffer is not None:
+            Instance._Buffer = []
+        if self._Instrumentation is not None:
+            Instance.EnableInstrumentation(self._Instrumentation.Callback)
+        return Instance
+    
+    #Returns Amount copies of this instance with statistically independent random streams derived from this instance's generator.
+    #Each copy can safely be used from its own thread and the whole set is reproducible if this instance was seeded.
+    def Spawn(self, Amount):
+        return [self._Clone(Random) for Random in SpawnGenerators(self.Random, Amount)]
+    
+    @classmethod
+    def GetCacheStats(cls):
+        return cls._PatternCache.GetStats()
+    
+    @classmethod
+    def SetCacheSize(cls, MaxSize):
+        cls._PatternCache.Resize(MaxSize)
+    
+    @classmethod
+    def ClearCache(cls):
+        cls._PatternCache.Clear()
+    
+    #Tables computed from now on are saved in Store (a SciDice.TableStore) and tables already in Store are loaded from it instead of being computed.
+    #Pass None to stop using a store.
+    @classmethod
+    def SetTableStore(cls, Store):
+        cls._TableStore = Store
+    
+    #Computes the tables of each pattern and saves them in the table store, so that processes started afterwards only need to load them.
+    #With SumTables, the distribution of the sum and its alias table are also computed for summed patterns.
+    @classmethod
+    def WarmTables(cls, Patterns, SumTables=True):
+        if cls._TableStore is None:
+            raise ValueError("No table store was set.")
+        for Pattern in Patterns:
+            Instance = cls(Pattern, LightConstructor=False)
+            if SumTables and Instance.Sum and Instance.Rolls > 1 and not(Instance.PoolMechanics):
+                Instance._GetSumTable()
+    
+    #Loads the named tables of Key from the table store or, failing that, gets them from Build and saves them in the store.
+    #Build can return None if the tables can't be computed.
+    def _LoadTables(self, Key, Names, Build):
+        Store = self._TableStore
+        if Store is not None:
+            Tables = tuple(Store.Get(Key, Name) for Name in Names)
+            if all(Table is not None for Table in Tables):
+                return Tables
+        Tables = Build()
+        if Store is not None and Tables is not None:
+            for Name, Table in zip(Names, Tables):
+                Store.Put(Key, Name, Table)
+        return Tables
+    
+    @property
+    def Pdf(self):
+        return self._Tables['Pdf']
+    
+    @Pdf.setter
+    def Pdf(self, Value):
+        self._Tables['Pdf'] = Value
+    
+    @property
+    def Cdf(self):
+        return self._Tables['Cdf']
+    
+    @Cdf.setter
+    def Cdf(self, Value):
+        self._Tables['Cdf'] = Value
     
     def __repr__(self):
-        Repr = "Generator String " + self.GeneratorString
-        Repr = "\nRolls: " + str(self.Rolls)
+        Repr = "Generator String: " + self.GeneratorString
+        Repr = Repr + "\nRolls: " + str(self.Rolls)
         Repr = Repr + "\nFaces: "+ str(self.Faces)
         Repr = Repr + "\nSum: " + ("Yes" if self.Sum else "No")
         Repr = Repr + "\nDistribution: " + self._GetDistributionString()
+        if self.PoolMechanics:
+            Repr = Repr + "\nExploding: " + ("Yes" if self.Explode else "No")
+            Repr = Repr + "\nRerolled below: " + (str(self.RerollBelow) if self.RerollBelow > 0 else "None")
+            Repr = Repr + "\nSuccesses: " + ("Die"+self.SuccessComparison+str(self.SuccessTarget) if self.SuccessComparison != None else "None")
+        Repr = Repr + "\nSampling strategy: " + self.Strategy + (" (automatically selected)" if self.AutoStrategy else "")
+        Repr = Repr + "\nOutput mode: " + self.Mode + (" (normal approximation of the sum)" if self.ApproximatedSum else "")
         if self.Distribution == self.NORMAL_DIST:
             Repr = Repr + "\nUniform sample range: " + str(self.UniformGeneratorRange)
             Repr = Repr + "\nUniform sample range length: " + str(self.UniformGeneratorRange[1]-self.UniformGeneratorRange[0])
-        if self.Pdf != None:
-            Repr = Repr + "\nConditional Pdf over range: " + str(self.RangeConditionalDiscretePdf) + "\nConditional Cdf over range: " + str(self.Cdf) 
+        if self.Pdf is not None:
+            Repr = Repr + "\nConditional Pdf over range: " + str(self.Pdf) + "\nConditional Cdf over range: " + str(self.Cdf) 
         return Repr
     
+    #The CdfSearch strategy is the only one that works for every distribution, since it samples the faces directly from the precomputed self.Cdf table.
+    #It costs O(log(Faces)) per die and never rejects a sample, so its speed does not depend on how much of the distribution lies outside 0..Faces.
+    #With Dice.AUTO_STRATEGY, the strategy is picked by SelectStrategy and self.AutoStrategy is True. Either way, self.Strategy is the strategy in use.
+    def SetStrategy(self, Strategy):
+        self.AutoStrategy = (Strategy == self.AUTO_STRATEGY)
+        if self.AutoStrategy:
+            Strategy = self.SelectStrategy()
+        elif Strategy not in self._SupportedStrategies[self.Distribution]:
+            raise ValueError("Sampling strategy '"+str(Strategy)+"' is not supported for distribution "+self._GetDistributionString()+".")
+        self._BindStrategy(Strategy)
+        self._ClearBuffer()
+    
+    def _BindStrategy(self, Strategy):
+        if Strategy == self.CDF_SEARCH_STRATEGY and self.Cdf is None:
+            self._GenerateRangeConditionalDistributions()
+        self.Strategy = Strategy
+        self._GenerateRoll = getattr(self, '_GenerateRoll'+Strategy)
+        self._GenerateRolls = getattr(self, '_GenerateRolls'+Strategy)
+        if self.LowMemory:
+            self._GenerateBlock = self._GenerateRolls
+            self._GenerateRolls = self._GenerateRollsInBlocks
+        if self._Instrumentation is not None:
+            self._GenerateRoll = self._Instrumentation.Wrap('Sampling', self._GenerateRoll)
+            self._GenerateRolls = self._Instrumentation.Wrap('Sampling', self._GenerateRolls)
+        if self.PoolMechanics:
+            self._GenerateBaseRolls = self._GenerateRolls
+            self._GenerateRoll = self._GenerateRollWithMechanics
+            self._GenerateRolls = self._GenerateRollsWithMechanics
+    
+    #Counts samples, rejections and calls and times the stages of the rolls (see SciDice.Instrumentation), which GetStats reports.
+    #Timed methods are replaced by wrappers, so instances that aren't instrumented run exactly the same code as before. Spawned copies are instrumented too.
+    #Callback, if set, is called as Callback(Instance, Stage, Seconds, Size) after each timed call, ie to export them to a metrics system.
+    def EnableInstrumentation(self, Callback=None):
+        self.DisableInstrumentation()
+        self._Instrumentation = Instrumentation(self, Callback)
+        for Method, Stage in self._InstrumentedStages:
+            setattr(self, Method, self._Instrumentation.Wrap(Stage, getattr(self, Method)))
+        self._BindStrategy(self.Strategy)
+    
+    def DisableInstrumentation(self):
+        if self._Instrumentation is not None:
+            del self._Instrumentation
+            for Method, Stage in self._InstrumentedStages:
+                delattr(self, Method)
+            self._BindStrategy(self.Strategy)
+    
+    #Counters and timings (in seconds) since instrumentation was enabled or the stats were reset. See Instrumentation.GetStats.
+    def GetStats(self):
+        if self._Instrumentation is None:
+            raise ValueError("Instrumentation is not enabled.")
+        return self._Instrumentation.GetStats()
+    
+    def ResetStats(self):
+        if self._Instrumentation is not None:
+            self._Instrumentation.Reset()
+    
+    #Estimated time in seconds of one call to the sampler of each supported strategy for Rolls dice (self.Rolls by default).
+    #Rejection sampling draws Rolls/Acceptance samples in total, where Acceptance is the mass of the distribution inside 0..Faces, and its loop 
+    #runs until the last of the Rolls dice is accepted, which takes about 1+log(Rolls)/log(1/(1-Acceptance)) iterations, each rescanning the samples.
+    def EstimateStrategyCosts(self, Rolls=None):
+        Rolls = (self.Rolls if Rolls is None else Rolls)
+        Acceptance = (1.0 if self.UniformGeneratorRange is None else float(self.UniformGeneratorRange[1]-self.UniformGeneratorRange[0]))
+        Costs = {}
+        for Strategy in self._SupportedStrategies[self.Distribution]:
+            Overhead, PerDie, Scalar = self._StrategyCosts[(self.Distribution, Strategy)]
+            if Strategy == self.TRIAL_ERROR_STRATEGY:
+                Iterations = (1.0+numpy.log(Rolls)/-numpy.log1p(-Acceptance) if Acceptance < 1.0 and Rolls > 1 else 1.0)
+                Costs[Strategy] = (Scalar/Acceptance if Rolls == 1 else Iterations*Overhead+PerDie*Rolls*(0.5/Acceptance+0.5*Iterations))
+            elif Strategy == self.CDF_SEARCH_STRATEGY:
+                Costs[Strategy] = (Scalar if Rolls == 1 else Overhead+PerDie*self._GetSearchLevels(self.Faces)*Rolls)
+                if self.Cdf is None:
+                    Costs[Strategy] += self._TableCost[0]+self._TableCost[1]*self.Faces
+            else:
+                Costs[Strategy] = (Scalar if Rolls == 1 else Overhead+PerDie*Rolls)
+        return Costs
+    
+    @staticmethod
+    def _GetSearchLevels(Faces):
+        return float(numpy.log2(Faces+1))
+    
+    #Cheapest strategy according to EstimateStrategyCosts. Pass the typical amount of dice per call as Rolls if the instance is mostly used with GenerateTrials
+    def SelectStrategy(self, Rolls=None):
+        Costs = self.EstimateStrategyCosts(Rolls)
+        return min(self._SupportedStrategies[self.Distribution], key=lambda Strategy: Costs[Strategy])
+    
+    #Replaces the cost model with measurements made on the current machine. Only done once per process unless Force is True.
+    @classmethod
+    def CalibrateStrategies(cls, Force=False):
+        if cls._CalibratedStrategies and not(Force):
+            return dict(cls._StrategyCosts)
+        #Reference patterns where virtually all of the distribution is inside the range, so that rejections don't skew the measurements
+        References = {cls.UNIFORM_DIST: '1d20', cls.NORMAL_DIST: '1d20~n(10,2)', cls.EXPONENTIAL_DIST: '1d20~e(1)', cls.ROTATED_EXPONENTIAL_DIST: '1d20~re(1)'}
+        ReferenceFaces = 20
+        Small, Large = 16, 65536
+        def Measure(Function):
+            Timer = timeit.Timer(Function)
+            Number = Timer.autorange()[0]
+            return min(Timer.repeat(3, Number))/Number
+        Costs = {}
+        for Distribution, Pattern in References.items():
+            for Strategy in cls._SupportedStrategies[Distribution]:
+                Instance = cls(Pattern, Strategy=Strategy)
+                SmallTime = Measure(lambda: Instance._GenerateRolls(Small))
+                PerDie = max((Measure(lambda: Instance._GenerateRolls(Large))-SmallTime)/(Large-Small), 0.0)
+                if Strategy == cls.CDF_SEARCH_STRATEGY:
+                    Costs[(Distribution, Strategy)] = (max(SmallTime-PerDie*Small, 0.0), PerDie/cls._GetSearchLevels(ReferenceFaces), Measure(Instance._GenerateRoll))
+                else:
+                    Costs[(Distribution, Strategy)] = (max(SmallTime-PerDie*Small, 0.0), PerDie, Measure(Instance._GenerateRoll))
+        #The table of a large die gives the cost per face
+        SmallTime = Measure(cls(References[cls.NORMAL_DIST])._ComputeRangeConditionalDistributions)
+        PerFace = max((Measure(cls('1d'+str(Large)+'~n('+str(Large//2)+','+str(Large//4)+')')._ComputeRangeConditionalDistributions)-SmallTime)/(Large-ReferenceFaces), 0.0)
+        cls._TableCost = (max(SmallTime-PerFace*ReferenceFaces, 0.0), PerFace)
+        cls._StrategyCosts = Costs
+        cls._CalibratedStrategies = True
+        return dict(Costs)
+    
+    #Histogram mode makes the cost of summed and :<|> patterns O(Faces) instead of O(Rolls), both in time and memory.
+    #Patterns that return every die separately still need every die to be drawn, so they are unaffected by it.
+    def SetMode(self, Mode):
+        if Mode not in (self.DIRECT_MODE, self.HISTOGRAM_MODE, self.SUM_TABLE_MODE, self.APPROXIMATE_SUM_MODE):
+            raise ValueError("Output mode '"+str(Mode)+"' is not supported.")
+        if Mode != self.DIRECT_MODE:
+            self._CheckDieDistribution("Output mode '"+Mode+"'")
+        if Mode != self.DIRECT_MODE and self.Pdf is None:
+            self._GenerateRangeConditionalDistributions()
+        self.Mode = Mode
+        self._SumTable = None
+        self._SumNormal = None
+        if Mode in (self.SUM_TABLE_MODE, self.APPROXIMATE_SUM_MODE) and self.Sum and self.Rolls > 1:
+            self._SumTable = self._GetSumTable()
+            if self._SumTable is None and Mode == self.APPROXIMATE_SUM_MODE and self.HighLowAmount == 0:
+                Values = numpy.arange(1, self.Faces+1)
+                Mean = (Values*self.Pdf).sum()
+                self._SumNormal = (self.Rolls*Mean, numpy.sqrt(self.Rolls*(((Values-Mean)**2)*self.Pdf).sum()))
+        self.ApproximatedSum = self._SumNormal is not None
+        self._ClearBuffer()
+    
+    def _UsesFaceCounts(self):
+        return self.Mode == self.HISTOGRAM_MODE and self.Rolls > 1 and (self.Sum or self.HighLowAmount > 0)
+    
+    def _SamplesSums(self):
+        return self._SumTable is not None or self._SumNormal is not None
+    
+    #Alias table (see CustomDistributions.AliasTable) of the values of the sum with a non-null probability or None if it is too expensive to build
+    def _GetSumTable(self):
+        if 'SumTable' in self._Tables:
+            return self._Tables['SumTable']
+        Kept = (self.HighLowAmount if self.HighLowAmount > 0 else self.Rolls)
+        Table = None
+        if Kept*(self.Faces-1)+1 <= self.MaxSumTableSize and (self.HighLowAmount == 0 or self._EstimateKeptSumSeconds(Kept) <= self.MaxKeptSumSeconds):
+            Table = self._LoadTables(self._GetNormalizedPattern(), ('SumValues', 'SumProbabilities', 'SumAliases'), self._ComputeSumTable)
+        self._Tables['SumTable'] = Table
+        return Table
+    
+    def _EstimateKeptSumSeconds(self, Kept):
+        PerFace, PerOperation, PerElement = self._KeptSumCosts
+        return self.Faces*(PerFace+2*Kept*PerOperation+self.Faces*Kept**3*PerElement)
+    
+    def _ComputeSumTable(self):
+        Values, Pmf = self.GetResultDistribution()
+        NonNull = numpy.flatnonzero(Pmf > 0.0)
+        Values, Pmf = Values[NonNull[0]:NonNull[-1]+1], Pmf[NonNull[0]:NonNull[-1]+1]
+        return (Values,)+AliasTable(Pmf)
+    
+    #Walker's alias method: pick an entry uniformly, then keep it or take its alias, which is O(1) per total whatever the size of the table
+    def _GenerateSums(self, Size=None):
+        if self._SumTable is not None:
+            Values, Probabilities, Aliases = self._SumTable
+            if Size is None:
+                Index = int(self.Random.integers(0, Values.size))
+                return Values[Index if self.Random.random() < Probabilities[Index] else Aliases[Index]]
+            Indexes = self.Random.integers(0, Values.size, Size)
+            return Values[numpy.where(self.Random.random(Size) < Probabilities[Indexes], Indexes, Aliases[Indexes])]
+        Mean, SD = self._SumNormal
+        Result = numpy.clip(numpy.rint(self.Random.normal(Mean, SD, Size)), self.Rolls, self.Rolls*self.Faces).astype(int)
+        return (Result[()] if Size is None else Result)
+    
+    #The tables of a die only depend on its faces and distribution, so they are shared in the table store by all patterns using the same die
     def _GenerateRangeConditionalDistributions(self):
+        Pdf, Cdf = self._LoadTables(self._GetDiePattern(), ('Pdf', 'Cdf'), self._ComputeRangeConditionalDistributions)
+        #Tables can be shared between instances, so they are made read-only
+        Pdf.setflags(write=False)
+        Cdf.setflags(write=False)
+        self.Pdf, self.Cdf = Pdf, Cdf
+    
+    def _ComputeRangeConditionalDistributions(self):
         if self.Distribution == self.NORMAL_DIST:
-            CdfSource = stats.norm
+            CdfSource = Normal
             Params = {'loc': self.Mean, 'scale': self.SD}
         elif self.Distribution == self.EXPONENTIAL_DIST:
-            CdfSource = stats.expon
+            CdfSource = Exponential
             Params = {'scale': 1.0/self.Lambda}
         elif self.Distribution == self.ROTATED_EXPONENTIAL_DIST:
             CdfSource = RotatedExponential
             Params = {'scale':  1.0/self.Lambda, 'loc': float(self.Faces)}
-        elif self.Distribution == self.UNIFORM_DIST:
-            self.Pdf = numpy.repeat(1.0/self.Faces, self.Faces)
-            self.Cdf = self.Pdf.cumsum()
-            return
-        Params['x'] = numpy.arange(1, self.Faces+1, dtype=numpy.float)
-        self.Cdf = RangeConditionalCdf(Distribution=CdfSource, Min=0.0, Max=float(self.Faces), **Params)
-        self.Pdf = FromCdfToPdf(self.Cdf)
+        if self.Distribution == self.UNIFORM_DIST:
+            Pdf = numpy.repeat(1.0/self.Faces, self.Faces)
+            Cdf = Pdf.cumsum()
+        else:
+            Params['x'] = numpy.arange(1, self.Faces+1, dtype=float)
+            Cdf = RangeConditionalCdf(Distribution=CdfSource, Min=0.0, Max=float(self.Faces), **Params)
+            Pdf = FromCdfToPdf(Cdf)
+        return Pdf, Cdf
+            
+    def _GetNormalizedPattern(self):
+        Pattern = ('' if self.Sum else '\\')+str(self.Rolls)+'d'+str(self.Faces)+('!' if self.Explode else '')
+        if self.RerollBelow > 0:
+            Pattern = Pattern+'r<'+str(self.RerollBelow)
+        if self.HighLowAmount > 0:
+            Pattern = Pattern+':'+('>' if self.Descending else '<')+str(self.HighLowAmount)
+        if self.SuccessComparison != None:
+            Pattern = Pattern+'#'+self.SuccessComparison+str(self.SuccessTarget)
+        return Pattern+self._GetDistributionPattern()
+    
+    #Normalized pattern of a single die of the pattern
+    def _GetDiePattern(self):
+        return '1d'+str(self.Faces)+self._GetDistributionPattern()
+    
+    def _GetDistributionPattern(self):
+        if self.Distribution == self.NORMAL_DIST:
+            return '~n('+repr(self.Mean)+','+repr(self.SD)+')'
+        elif self.Distribution == self.EXPONENTIAL_DIST:
+            return '~e('+repr(self.Lambda)+')'
+        elif self.Distribution == self.ROTATED_EXPONENTIAL_DIST:
+            return '~re('+repr(self.Lambda)+')'
+        return ''
             
     def _GetDistributionString(self):
         if self.Distribution == self.UNIFORM_DIST:
@@ -157,107 +577,458 @@ class Dice(object):
 
     def _GenerateRollBasic(self):
         if self.Distribution == self.UNIFORM_DIST:
-            return numpy.random.randint(1, self.Faces+1)
+            return self.Random.integers(1, self.Faces+1)
 
     def _GenerateRollTrialError(self):
+        Rejections = 0
         if self.Distribution == self.NORMAL_DIST:
-            Sample = numpy.random.normal(self.Mean, self.SD)
+            Sample = self.Random.normal(self.Mean, self.SD)
             while Sample < 0.0 or Sample > float(self.Faces):
-                Sample = numpy.random.normal(self.Mean, self.SD)
+                Sample = self.Random.normal(self.Mean, self.SD)
+                Rejections += 1
         elif self.Distribution == self.EXPONENTIAL_DIST:
-            Sample = numpy.random.exponential(scale=1.0/self.Lambda)
+            Sample = self.Random.exponential(scale=1.0/self.Lambda)
             while Sample > float(self.Faces):
-                Sample = numpy.random.exponential(scale=1.0/self.Lambda)
+                Sample = self.Random.exponential(scale=1.0/self.Lambda)
+                Rejections += 1
         else:
             return None
+        if self._Instrumentation is not None:
+            self._Instrumentation.CountRejections(Rejections, Rejections)
         return min(int(Sample)+1, self.Faces)
     
-    #Was tempted to just plug self.RangeConditionalDiscretePdf in a scipy.stats.rv_discrete object and call rvs on the instance, but strangely, 
-    #the following Python coded O(log(n)) search algorithm on the numpy array ran an incredulous ~30 times faster on my manual performance tests.
+    #Was tempted to just plug self.Pdf in a scipy.stats.rv_discrete object and call rvs on the instance, but a binary search on self.Cdf ran 
+    #~30 times faster on my manual performance tests. numpy.searchsorted does that same search, but in C and over a whole array of samples.
+    #side='right' makes sure that faces with a null probability (equal consecutive Cdf values) can never be picked.
     def _GenerateRollCdfSearch(self):
-        if self.RangeConditionalDiscreteCdf != None:
-            Sample = numpy.random.uniform(0.0, 1.0)
-            Bottom = 0
-            Top = self.Faces-1
-            Index = self.Faces//2
-            while True:
-                if Index == Bottom or (Sample <= self.RangeConditionalDiscreteCdf[Index] and Sample > self.RangeConditionalDiscreteCdf[Index-1]):
-                    break
-                elif Sample < self.RangeConditionalDiscreteCdf[Index]:
-                    Top = Index
-                    Index = (Index+Bottom)//2
-                elif Sample > self.RangeConditionalDiscreteCdf[Index]:
-                    Bottom = Index                      
-                    Index = (Index+Top+1)//2
-            return Index+1
+        return min(int(numpy.searchsorted(self.Cdf, self.Random.uniform(0.0, 1.0), side='right')), self.Faces-1)+1
     
     def _GenerateRollQuantile(self):
-        if self.UniformGeneratorRange != None:
-            Sample = numpy.random.uniform(self.UniformGeneratorRange[0], self.UniformGeneratorRange[1])
+        if self.UniformGeneratorRange is not None:
+            Sample = self.Random.uniform(self.UniformGeneratorRange[0], self.UniformGeneratorRange[1])
             if self.Distribution == self.NORMAL_DIST:
-                return int(stats.norm.ppf(Sample, loc = self.Mean, scale = self.SD))+1
+                return int(Normal.ppf(Sample, loc = self.Mean, scale = self.SD))+1
             elif self.Distribution == self.EXPONENTIAL_DIST:
                 return int(Exponential.ppf(Sample, scale=1.0/self.Lambda))+1
             elif self.Distribution == self.ROTATED_EXPONENTIAL_DIST:
                 return int(RotatedExponential.ppf(Sample, loc=float(self.Faces), scale=1.0/self.Lambda))+1
             
-    def _GenerateRollsBasic(self):
+    #Size defaults to self.Rolls, but can also be a shape tuple such as (Trials, Rolls) so that many independent trials are drawn in one call.
+    #If Out is passed, the dice are written in it (its shape then overrides Size) and it is returned.
+    def _GenerateRollsBasic(self, Size=None, Out=None):
         if self.Distribution == self.UNIFORM_DIST:
-            return numpy.random.randint(1, self.Faces+1, self.Rolls)
-                    
-    def _GenerateRollsTrialError(self):
+            return self._StoreResult(self.Random.integers(1, self.Faces+1, self._GetShape(Size, Out), dtype=self.RollsDtype), Out)
+    
+    #Only the indexes of the rejected samples are kept between iterations, so each iteration only touches the samples that are redrawn
+    def _GenerateRollsTrialError(self, Size=None, Out=None):
+        Shape = self._GetShape(Size, Out)
         if self.Distribution == self.NORMAL_DIST:
-            Samples = numpy.random.normal(self.Mean, self.SD, size=self.Rolls)
-            Samples[Samples>float(self.Faces)]=-1.0
-            OutofRangeAmount = Samples[Samples<0.0].size
-            while OutofRangeAmount > 0:
-                Samples[Samples<0.0]  = numpy.random.normal(self.Mean, self.SD, OutofRangeAmount)
-                Samples[Samples>float(self.Faces)]=-1.0
-                OutofRangeAmount = Samples[Samples<0.0].size
+            Draw = self._DrawNormalSamples
         elif self.Distribution == self.EXPONENTIAL_DIST:
-            Samples = numpy.random.exponential(scale=1.0/self.Lambda, size=self.Rolls)
-            OutofRangeAmount = Samples[Samples>float(self.Faces)].size
-            while OutofRangeAmount > 0:
-                Samples[Samples>float(self.Faces)] = numpy.random.exponential(scale=1.0/self.Lambda, size=OutofRangeAmount)
-                OutofRangeAmount = Samples[Samples>float(self.Faces)].size
+            Draw = self._DrawExponentialSamples
         else:
             return None
-        return numpy.minimum(Samples.astype(numpy.int)+1, self.Faces)
-            
-       
-    def _GenerateRollsQuantile(self):
-        if self.UniformGeneratorRange != None:
-            Samples = numpy.random.uniform(self.UniformGeneratorRange[0], self.UniformGeneratorRange[1], size=self.Rolls)
+        Samples = Draw(Shape)
+        Flat = Samples.reshape(-1)
+        Rejected = numpy.flatnonzero((Flat < 0.0) | (Flat > self.Faces))
+        while Rejected.size > 0:
+            if self._Instrumentation is not None:
+                self._Instrumentation.CountRejections(Rejected.size, 1)
+            Redrawn = Draw(Rejected.size)
+            Flat[Rejected] = Redrawn
+            Rejected = Rejected[(Redrawn < 0.0) | (Redrawn > self.Faces)]
+        return self._SamplesToFaces(Samples, Out)
+    
+    def _DrawNormalSamples(self, Shape):
+        Samples = self.Random.standard_normal(Shape, dtype=self._SampleDtype)
+        Samples *= self.SD
+        Samples += self.Mean
+        return Samples
+    
+    def _DrawExponentialSamples(self, Shape):
+        Samples = self.Random.standard_exponential(Shape, dtype=self._SampleDtype)
+        Samples *= 1.0/self.Lambda
+        return Samples
+    
+    def _GenerateRollsQuantile(self, Size=None, Out=None):
+        if self.UniformGeneratorRange is not None:
+            Samples = self.Random.uniform(self.UniformGeneratorRange[0], self.UniformGeneratorRange[1], size=self._GetShape(Size, Out))
             if self.Distribution == self.NORMAL_DIST:
-                return stats.norm.ppf(Samples, loc = self.Mean, scale = self.SD).astype(numpy.int)+1
+                return self._SamplesToFaces(Normal.ppf(Samples, loc = self.Mean, scale = self.SD), Out)
             elif self.Distribution == self.EXPONENTIAL_DIST:
-                return Exponential.ppf(Samples, scale=1.0/self.Lambda).astype(numpy.int)+1
+                return self._SamplesToFaces(Exponential.ppf(Samples, scale=1.0/self.Lambda), Out)
             elif self.Distribution == self.ROTATED_EXPONENTIAL_DIST:
-                return RotatedExponential.ppf(Samples, loc=float(self.Faces), scale=1.0/self.Lambda).astype(numpy.int)+1
+                return self._SamplesToFaces(RotatedExponential.ppf(Samples, loc=float(self.Faces), scale=1.0/self.Lambda), Out)
+    
+    def _GenerateRollsCdfSearch(self, Size=None, Out=None):
+        Samples = self.Random.uniform(0.0, 1.0, size=self._GetShape(Size, Out))
+        Indexes = numpy.searchsorted(self.Cdf, Samples, side='right')
+        del Samples
+        numpy.minimum(Indexes, self.Faces-1, out=Indexes)
+        return numpy.add(Indexes, 1, out=self._NewRolls(Indexes.shape, Out), casting='unsafe')
+    
+    def _GetShape(self, Size, Out):
+        return (Out.shape if Out is not None else (self.Rolls if Size is None else Size))
+    
+    def _NewRolls(self, Shape, Out):
+        return (numpy.empty(Shape, dtype=self.RollsDtype) if Out is None else Out)
+    
+    def _StoreResult(self, Result, Out):
+        if Out is None or Result is Out:
+            return Result
+        if Out.shape != numpy.shape(Result):
+            raise ValueError("Output array must have shape "+str(numpy.shape(Result))+".")
+        Out[...] = Result
+        return Out
+    
+    #Samples of the continuous distributions over 0..Faces are truncated into dice while being written to the output array, without temporaries
+    def _SamplesToFaces(self, Samples, Out=None):
+        Result = numpy.add(Samples, 1, out=self._NewRolls(Samples.shape, Out), casting='unsafe')
+        return numpy.minimum(Result, self.Faces, out=Result)
+    
+    #In low-memory mode:
+    #    - dice are returned in the smallest unsigned integer type that holds Faces (ie, uint8 for a d6) instead of 64 bits integers
+    #    - normal and exponential samples are drawn in float32 when Faces is small enough for float32 to tell faces apart without bias
+    #    - the dice are drawn BlockSize at a time directly in the output array, so temporaries are bounded by the block size
+    #Results follow the same distribution as in the default mode, but not the same random stream.
+    def EnableLowMemory(self, BlockSize=65536):
+        if BlockSize < 1:
+            raise ValueError("Block size must be at least 1.")
+        self.LowMemory = True
+        self.LowMemoryBlockSize = BlockSize
+        #Exploding dice can go above Faces
+        self.RollsDtype = (numpy.dtype(int) if self.Explode else numpy.min_scalar_type(self.Faces))
+        self._SampleDtype = numpy.dtype(numpy.float32 if self.Faces <= 2**16 else float)
+        self._BindStrategy(self.Strategy)
+        self._ClearBuffer()
+    
+    def DisableLowMemory(self):
+        self.LowMemory = False
+        self.RollsDtype = numpy.dtype(int)
+        self._SampleDtype = numpy.dtype(float)
+        self._BindStrategy(self.Strategy)
+        self._ClearBuffer()
+    
+    def _GenerateRollsInBlocks(self, Size=None, Out=None):
+        Out = self._NewRolls(self._GetShape(Size, Out), Out)
+        if not Out.flags.c_contiguous:
+            raise ValueError("Output array must be contiguous.")
+        Flat = Out.reshape(-1)
+        for Start in range(0, Flat.size, self.LowMemoryBlockSize):
+            self._GenerateBlock(Out=Flat[Start:Start+self.LowMemoryBlockSize])
+        return Out
+    
+    #Rerolls and explosions must stop at some point, so rerolled dice must be able to land on RerollBelow or more and an exploding die must be able
+    #to land on something else than the highest face
+    def _CheckRedraws(self):
+        if self.Pdf is None:
+            self._GenerateRangeConditionalDistributions()
+        Remaining = self.Pdf[max(self.RerollBelow, 1)-1:].sum()
+        if Remaining <= 0.0:
+            raise ValueError("Rerolled dice can never land on "+str(self.RerollBelow)+" or more.")
+        if self.Explode and self.Pdf[-1] >= Remaining:
+            raise ValueError("Exploding dice would never stop exploding.")
+    
+    #Applies the '!' and 'r<' parts of the pattern to the dice drawn by the sampling strategy (_GenerateBaseRolls), in place. Like the rejection loop of
+    #_GenerateRollsTrialError, only the indexes of the affected dice are kept, so each step only draws and touches the dice that are redrawn:
+    #    - the dice below RerollBelow are redrawn once, directly from the distribution of the die over RerollBelow..Faces (see _DrawRerolledDice),
+    #      which is the same as rerolling them until they land on RerollBelow or more
+    #    - the dice on the highest face get another die added to them and the ones whose added die is also on the highest face are kept for the next
+    #      iteration. Each iteration only keeps Pdf[-1] of the previous one, so there are O(log(Rolls)) iterations.
+    def _GenerateRollsWithMechanics(self, Size=None, Out=None):
+        Result = self._GenerateBaseRolls(Size, Out)
+        if not Result.flags.c_contiguous:
+            raise ValueError("Output array must be contiguous.")
+        Flat = Result.reshape(-1)
+        if self.RerollBelow > 0:
+            Rerolled = numpy.flatnonzero(Flat < self.RerollBelow)
+            Flat[Rerolled] = self._DrawRerolledDice(Rerolled.size)
+        if self.Explode:
+            Exploding = numpy.flatnonzero(Flat == self.Faces)
+            while Exploding.size > 0:
+                Added = (self._DrawRerolledDice(Exploding.size) if self.RerollBelow > 0 else self._GenerateBaseRolls(Exploding.size))
+                Flat[Exploding] += Added
+                Exploding = Exploding[Added == self.Faces]
+        return Result
+    
+    #Same as the CdfSearch strategy, with the uniform samples restricted to the part of the Cdf of faces RerollBelow..Faces
+    def _DrawRerolledDice(self, Size):
+        if self.Distribution == self.UNIFORM_DIST:
+            return self.Random.integers(self.RerollBelow, self.Faces+1, Size)
+        Samples = self.Random.uniform(self.Cdf[self.RerollBelow-2], 1.0, Size)
+        Indexes = numpy.searchsorted(self.Cdf, Samples, side='right')
+        numpy.minimum(Indexes, self.Faces-1, out=Indexes)
+        return Indexes+1
+    
+    def _GenerateRollWithMechanics(self):
+        return self._CountSuccesses(self._GenerateRolls(1))[0]
+    
+    #Replaces the dice by 1 for successes and 0 otherwise if the pattern counts successes
+    def _CountSuccesses(self, Result):
+        if self.SuccessComparison == None:
+            return Result
+        return self._SuccessComparisons[self.SuccessComparison](Result, self.SuccessTarget).astype(int)
+    
+    #Exploding dice, rerolls and success counting change the distribution of the result, so the methods computed from self.Pdf don't support them
+    def _CheckDieDistribution(self, Feature):
+        if self.PoolMechanics:
+            raise ValueError(Feature+" is not supported for patterns with exploding dice, rerolls or success counting.")
+    
+    #Applies the :<|> part of the pattern along the last axis. Keeping the top/bottom dice of a subset of the rolls and then of the union of those 
+    #subsets is the same as keeping them from all the rolls, which is what allows rolls to be processed in chunks
+    def _KeepRolls(self, Result):
+        if self.HighLowAmount > 0:
+            Result = SelectExtremes(Result, self.HighLowAmount, self.Descending, self._GetSelectionFaces())
+        return Result
+    
+    #Selection can only count dice per face when they are in 1..Faces, which exploding dice aren't
+    def _GetSelectionFaces(self):
+        return (None if self.Explode else self.Faces)
+    
+    #Applies the :<|>, success counting and sum parts of the pattern along the last axis, so it works both on a single roll array and on a (Trials, Rolls) matrix
+    def _ProcessRolls(self, Result):
+        if self.HighLowAmount > 0:
+            Result = self._KeepRolls(Result)
+        if self.SuccessComparison != None:
+            Result = self._CountSuccesses(Result)
+        if self.Sum:
+            Result = self._SumRolls(Result)
+        return Result
+    
+    def _SumRolls(self, Result):
+        return Result.sum(axis=-1, dtype=int)
+    
+    #Same as _ProcessRolls, but from the amount of dice that landed on each face (last axis) rather than from the dice themselves
+    def _ProcessFaceCounts(self, Counts):
+        Values = numpy.arange(1, self.Faces+1)
+        if self.HighLowAmount > 0:
+            if self.Descending:
+                Values, Counts = Values[::-1], Counts[..., ::-1]
+            #Dice on previous faces are kept first, so each face keeps whatever is left of the HighLowAmount dice
+            Counts = numpy.minimum(Counts, numpy.maximum(self.HighLowAmount-(Counts.cumsum(axis=-1)-Counts), 0))
+            if not self.Sum:
+                Rows = Counts.reshape(-1, self.Faces)
+                return numpy.repeat(numpy.tile(Values, Rows.shape[0]), Rows.ravel()).reshape(Counts.shape[:-1]+(self.HighLowAmount,))
+        return (Counts*Values).sum(axis=-1)
+    
+    #Number of dice that landed on each face, drawn directly from a multinomial over self.Pdf without drawing any individual die.
+    #Shape is (Faces,) if Trials is None and (Trials, Faces) otherwise
+    def GenerateFaceCounts(self, Trials=None):
+        self._CheckDieDistribution("GenerateFaceCounts")
+        if self.Pdf is None:
+            self._GenerateRangeConditionalDistributions()
+        return self.Random.multinomial(self.Rolls, self.Pdf, size=Trials)
     
-    def GenerateRolls(self):
+    #In buffered mode, results are drawn BlockSize at a time with GenerateTrials and GenerateRolls serves them one by one from a list.
+    #The buffer is refilled once RefillThreshold results or less are left, so single rolls mostly cost a list pop rather than a numpy/scipy call.
+    def EnableBuffer(self, BlockSize=1024, RefillThreshold=0):
+        if BlockSize < 1:
+            raise ValueError("Block size must be at least 1.")
+        if RefillThreshold < 0 or RefillThreshold >= BlockSize:
+            raise ValueError("Refill threshold must be between 0 and the block size.")
+        self._BufferBlockSize = BlockSize
+        self._BufferThreshold = RefillThreshold
+        self._Buffer = []
+    
+    def DisableBuffer(self):
+        self._Buffer = None
+    
+    #Buffered results were drawn with the previous strategy, mode or dtype, so the setters that change them drop the results
+    def _ClearBuffer(self):
+        if self._Buffer is not None:
+            self._Buffer = []
+    
+    #Results are served from the end of the list, so new blocks are inserted at the front to serve results in the order they were drawn.
+    #Scalar results are kept as numpy scalars, like the results of the unbuffered calls.
+    def _RefillBuffer(self):
+        Block = list(self.GenerateTrials(self._BufferBlockSize))
+        Block.reverse()
+        self._Buffer[:0] = Block
+    
+    #Out optionally receives array results (it must have the shape of the result) and is returned instead of a new array.
+    #When the result is the dice themselves, they are drawn directly in Out.
+    def GenerateRolls(self, Out=None):
+        if self._Buffer is not None:
+            if len(self._Buffer) <= self._BufferThreshold:
+                self._RefillBuffer()
+            return self._StoreResult(self._Buffer.pop(), Out)
         if self.Rolls == 1:
-            return self._GenerateRoll()
+            return self._StoreResult(self._GenerateRoll(), Out)
+        elif self._SamplesSums():
+            return self._StoreResult(self._GenerateSums(), Out)
+        elif self._UsesFaceCounts():
+            return self._StoreResult(self._ProcessFaceCounts(self.GenerateFaceCounts()), Out)
         else:
-            Result = self._GenerateRolls()
-            if self.HighLowAmount > 0:
-                Result.sort()
-                if self.Descending: 
-                    Result = Result[::-1]
-                Result = Result[:self.HighLowAmount]
-            if self.Sum:
-                Result = Result.sum()
-            return Result
+            return self._StoreResult(self._ProcessRolls(self._GenerateRolls(None, self._DiceOutput(Out, (self.Rolls,)))), Out)
+    
+    #Equivalent to calling GenerateRolls Trials times and stacking the results, except that all the dice are drawn in one call.
+    #Result has shape (Trials,) if the pattern yields a scalar and (Trials, <Amount of dice kept>) otherwise. Out works as in GenerateRolls.
+    def GenerateTrials(self, Trials, Out=None):
+        if Trials < 0:
+            raise ValueError("Number of trials cannot be negative.")
+        if self.Rolls == 1:
+            return self._StoreResult(self._CountSuccesses(self._GenerateRolls((Trials,), self._DiceOutput(Out, (Trials,), True))), Out)
+        elif self._SamplesSums():
+            return self._StoreResult(self._GenerateSums(Trials), Out)
+        elif self._UsesFaceCounts():
+            return self._StoreResult(self._ProcessFaceCounts(self.GenerateFaceCounts(Trials)), Out)
+        else:
+            return self._StoreResult(self._ProcessRolls(self._GenerateRolls((Trials, self.Rolls), self._DiceOutput(Out, (Trials, self.Rolls)))), Out)
+    
+    #Out if the dice can be drawn in it directly (the pattern returns its dice as they are), otherwise None
+    def _DiceOutput(self, Out, Shape, Direct=False):
+        if Out is None or not(Direct or (not(self.Sum) and self.HighLowAmount == 0 and self.SuccessComparison == None)):
+            return None
+        if Out.shape != tuple(Shape):
+            raise ValueError("Output array must have shape "+str(tuple(Shape))+".")
+        return Out
+    
+    #Yields the individual dice of one roll of the pattern (after explosions and rerolls, before the :<|>, success counting and sum parts are applied) in arrays of at most ChunkSize dice.
+    #Meant to be combined with the reducers in SciDice.Reducers or fed to other generators to process huge amounts of dice with bounded memory
+    #If Out (an array of at least ChunkSize elements) is passed, each chunk is drawn in it and yielded as a view, so it is overwritten by the next one
+    def IterRolls(self, ChunkSize, Out=None):
+        if ChunkSize < 1:
+            raise ValueError("Chunk size must be at least 1.")
+        if Out is not None and (Out.ndim != 1 or Out.size < min(ChunkSize, self.Rolls)):
+            raise ValueError("Output array must be one-dimensional and hold at least one chunk.")
+        return self._IterRolls(ChunkSize, Out)
+    
+    def _IterRolls(self, ChunkSize, Out=None):
+        Remaining = self.Rolls
+        while Remaining > 0:
+            Size = min(ChunkSize, Remaining)
+            yield self._GenerateRolls(Size, (None if Out is None else Out[:Size]))
+            Remaining -= Size
+    
+    #Combines chunks of dice into the result of the pattern, using bounded memory for summed and :<|> patterns.
+    #With Reduced, chunks were already reduced by the same logic (see SciDice.Parallel), so the successes of summed patterns were already counted.
+    def _ReduceChunks(self, Chunks, Reduced=False):
+        if self.HighLowAmount > 0:
+            Reducer = RunningKeep(self.HighLowAmount, self.Descending, self._GetSelectionFaces())
+        elif self.Sum:
+            Reducer = RunningSum()
+            if not(Reduced):
+                Chunks = (self._CountSuccesses(Chunk) for Chunk in Chunks)
+        else:
+            return self._CountSuccesses(numpy.concatenate(list(Chunks)))
+        for Chunk in Chunks:
+            Reducer.Update(Chunk)
+        Result = Reducer.Result()
+        if self.HighLowAmount > 0:
+            Result = self._CountSuccesses(Result)
+        return (Result.sum() if self.Sum and self.HighLowAmount > 0 else Result)
+    
+    #Same result as GenerateRolls, but the dice are drawn ChunkSize at a time and reduced as they come
+    def ReduceRolls(self, ChunkSize):
+        if self.Rolls == 1:
+            return self.GenerateRolls()
+        return self._ReduceChunks(self.IterRolls(ChunkSize))
+    
+    #Number of dice landing between faces Low and High inclusively, drawn from a binomial over the probability of the range (taken from self.Cdf) 
+    #without rolling the dice, so the cost doesn't depend on Rolls. For :<|> patterns, only the kept dice are counted. The sum part of the pattern is ignored.
+    #Returns an integer if Trials is None and an array of Trials counts otherwise.
+    def GenerateNumberRollsInRange(self, Low, High, Trials=None):
+        if self.HighLowAmount > 0:
+            Counts = self.GenerateNumberRollsInRanges([(Low, High)], Trials)
+            return (int(Counts[0]) if Trials is None else Counts[:, 0])
+        Segments, Probabilities = self._GetRangeProbabilities(numpy.array([[Low, High]]))
+        Count = self.Random.binomial(self.Rolls, Probabilities[Segments[0]], size=Trials)
+        return (int(Count) if Trials is None else Count)
+    
+    #Same as GenerateNumberRollsInRange for several disjoint (Low, High) ranges at once, drawn jointly from a multinomial over the ranges and 
+    #the faces outside of them. Result has shape (len(Ranges),) if Trials is None and (Trials, len(Ranges)) otherwise.
+    def GenerateNumberRollsInRanges(self, Ranges, Trials=None):
+        Ranges = numpy.asarray(Ranges, dtype=int).reshape(-1, 2)
+        Segments, Probabilities = self._GetRangeProbabilities(Ranges)
+        Counts = self.Random.multinomial(self.Rolls, Probabilities, size=Trials)
+        if self.HighLowAmount > 0:
+            #Same as in _ProcessFaceCounts, with segments of consecutive faces instead of faces
+            if self.Descending:
+                Counts = Counts[..., ::-1]
+            Counts = numpy.minimum(Counts, numpy.maximum(self.HighLowAmount-(Counts.cumsum(axis=-1)-Counts), 0))
+            if self.Descending:
+                Counts = Counts[..., ::-1]
+        return Counts[..., Segments]
+    
+    #Splits the faces into consecutive segments bounded by the ranges and returns the index of the segment of each range with the probabilities of the segments
+    def _GetRangeProbabilities(self, Ranges):
+        self._CheckDieDistribution("GenerateNumberRollsInRange")
+        Lows, Highs = Ranges[:, 0], Ranges[:, 1]
+        if (Lows < 1).any() or (Highs > self.Faces).any() or (Lows > Highs).any():
+            raise ValueError("Ranges must be between 1 and "+str(self.Faces)+", with Low <= High.")
+        Order = numpy.argsort(Lows)
+        if (Lows[Order][1:] <= Highs[Order][:-1]).any():
+            raise ValueError("Ranges cannot overlap.")
+        if self.Cdf is None:
+            self._GenerateRangeConditionalDistributions()
+        #Segment i covers faces Edges[i]+1..Edges[i+1], so a range Low..High is the segment starting at edge Low-1
+        Edges = numpy.unique(numpy.concatenate(([0, self.Faces], Lows-1, Highs)))
+        Cdf = numpy.concatenate(([0.0], self.Cdf))[Edges]
+        Cdf[-1] = 1.0
+        Probabilities = numpy.maximum(numpy.diff(Cdf), 0.0)
+        return numpy.searchsorted(Edges, Lows-1), Probabilities/Probabilities.sum()
+    
+    #Exact distribution of the result of the pattern, derived from self.Pdf rather than by sampling. Returns a (Values, Pmf) pair.
+    #If the pattern yields a scalar, Pmf[i] is the probability that the result is Values[i].
+    #If the pattern yields an array, Pmf has one row per element of the array, each row being the marginal distribution of that element over Values.
+    #Results are kept with the other precomputed tables, so only the first call for a given pattern pays for the convolutions (see Dice.FromCache).
+    def GetResultDistribution(self):
+        self._CheckDieDistribution("GetResultDistribution")
+        Cached = self._Tables.get('ResultDistribution')
+        if Cached is not None:
+            return Cached
+        if self.Pdf is None:
+            self._GenerateRangeConditionalDistributions()
+        if self.Rolls > 1 and (self.Sum or self.HighLowAmount > 0):
+            Values, Pmf = self._LoadTables(self._GetNormalizedPattern(), ('ResultValues', 'ResultPmf'), self._ComputeResultDistribution)
+        else:
+            Values, Pmf = self._ComputeResultDistribution()
+        if Values.flags.writeable:
+            Values.setflags(write=False)
+        if Pmf.flags.writeable:
+            Pmf.setflags(write=False)
+        self._Tables['ResultDistribution'] = (Values, Pmf)
+        return Values, Pmf
+    
+    def _ComputeResultDistribution(self):
+        Values = numpy.arange(1, self.Faces+1)
+        if self.Rolls == 1:
+            Pmf = self.Pdf.copy()
+        elif self.Sum and self.HighLowAmount == 0:
+            Values = numpy.arange(self.Rolls, self.Rolls*self.Faces+1)
+            Pmf = SumPdf(self.Pdf, self.Rolls)
+        elif self.Sum:
+            Values = numpy.arange(self.HighLowAmount, self.HighLowAmount*self.Faces+1)
+            Pmf = KeptSumPdf(self.Pdf, self.Rolls, self.HighLowAmount, self.Descending)[self.HighLowAmount:]
+        elif self.HighLowAmount > 0:
+            #The kept dice are sorted, so the element at position i is an order statistic
+            Ranks = numpy.arange(1, self.HighLowAmount+1)
+            if self.Descending:
+                Ranks = self.Rolls+1-Ranks
+            Pmf = numpy.diff(OrderStatisticsCdf(self.Cdf, self.Rolls, Ranks), axis=1, prepend=0.0)
+        else:
+            Pmf = numpy.broadcast_to(self.Pdf, (self.Rolls, self.Faces))
+        return Values, Pmf
     
-    #To implement later
-    def GenerateNumberRollsInRange(self, Low, High):
-        pass    
+    #Probability that the result falls between Low and High inclusively (either bound can be None for a tail probability)
+    def GetProbability(self, Low=None, High=None):
+        Values, Pmf = self.GetResultDistribution()
+        Mask = numpy.ones(Values.size, dtype=bool)
+        if Low is not None:
+            Mask &= Values >= Low
+        if High is not None:
+            Mask &= Values <= High
+        return Pmf[..., Mask].sum(axis=-1)
     
     def _GetMomentAboutOrigin(self, Moment):
-        pass
+        Values, Pmf = self.GetResultDistribution()
+        return (Pmf*numpy.power(Values.astype(float), Moment)).sum(axis=-1)
     
     def GetExpectedValue(self):
-        pass
+        return self._GetMomentAboutOrigin(1)
     
     def GetVariance(self):
-        pass
+        #Computed around the mean rather than as E[X^2]-E[X]^2 to avoid cancellation errors
+        Values, Pmf = self.GetResultDistribution()
+        Deviations = Values.astype(float)-self.GetExpectedValue()[..., numpy.newaxis]
+        return (Pmf*numpy.square(Deviations)).sum(axis=-1)
@@ -0,0 +1,112 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import os
+import numpy
+import concurrent.futures
+from SciDice.Main import Dice
+from SciDice.RandomStreams import SpawnSeedSequences
+
+#Executed in the worker processes. Dice.FromCache makes sure a worker only parses a given pattern once.
+#Each chunk is reduced as much as possible before being sent back: kept dice only for :<|> patterns and partial sums (of the successes if they are
+#counted) for summed patterns.
+def _RollChunk(Input, Options, SeedSequence, Rolls):
+    Instance = Dice.FromCache(Input, Seed=SeedSequence, **Options)
+    Result = Instance._GenerateRolls(Rolls)
+    if Instance.HighLowAmount > 0:
+        return Instance._KeepRolls(Result)
+    elif Instance.Sum:
+        return Instance._CountSuccesses(Result).sum()
+    return Result
+
+def _TrialsChunk(Input, Options, SeedSequence, Trials):
+    return Dice.FromCache(Input, Seed=SeedSequence, **Options).GenerateTrials(Trials)
+
+class ParallelDice(object):
+    """
+    -------------------------------------------------------------------------------------
+    |Usage: Instance = ParallelDice(<Pattern>, Workers=8); Instance.GenerateRolls()|
+    -------------------------------------------------------------------------------------
+    |-> Rolls the same patterns as Dice, but splits the dice into chunks of at most ChunkSize dice that are drawn in a pool of Workers processes, 
+    |   each chunk with its own independent random stream. Results are combined by concatenation, partial sums or merged kept dice.
+    |
+    |-> Chunks only depend on ChunkSize, so for a given Seed the result is the same no matter how many workers are used.
+    |
+    |-> The remaining keyword arguments (LightConstructor, Strategy, Mode) are passed to Dice.
+    |
+    |-> The pool is kept between calls. Call Close() or use the instance as a context manager to shut it down.
+    """
+    def __init__(self, Input, Workers=None, ChunkSize=2**22, Seed=None, **Options):
+        self.Dice = Dice(Input, Seed=Seed, **Options)
+        self.GeneratorString = Input
+        self.Workers = (os.cpu_count() or 1) if Workers is None else Workers
+        if self.Workers < 1:
+            raise ValueError("Number of workers must be at least 1.")
+        if ChunkSize < 1:
+            raise ValueError("Chunk size must be at least 1.")
+        self.ChunkSize = ChunkSize
+        self._Options = Options
+        self._Pool = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *Exception):
+        self.Close()
+    
+    def Close(self):
+        if self._Pool is not None:
+            self._Pool.shutdown()
+            self._Pool = None
+    
+    #Splits Amount in chunks of at most ChunkSize (self.ChunkSize by default). Chunk seeds are spawned from the instance's generator, so consecutive calls 
+    #produce different rolls. Results are yielded in chunk order as they become available.
+    def _Map(self, Function, Amount, ChunkSize=None):
+        ChunkSize = (self.ChunkSize if ChunkSize is None else ChunkSize)
+        Sizes = [ChunkSize]*(Amount//ChunkSize)
+        if Amount % ChunkSize > 0:
+            Sizes.append(Amount % ChunkSize)
+        Arguments = ([self.GeneratorString]*len(Sizes), [self._Options]*len(Sizes), SpawnSeedSequences(self.Dice.Random, len(Sizes)), Sizes)
+        if self.Workers == 1 or len(Sizes) == 1:
+            return map(Function, *Arguments)
+        if self._Pool is None:
+            self._Pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.Workers)
+        return self._Pool.map(Function, *Arguments)
+    
+    def GenerateRolls(self):
+        if self.Dice.Rolls == 1 or self.Dice._UsesFaceCounts():
+            return self.Dice.GenerateRolls()
+        return self.Dice._ReduceChunks(self._Map(_RollChunk, self.Dice.Rolls), Reduced=True)
+    
+    #Yields the chunks of a single roll as reduced by the workers (see _RollChunk), submitting BatchSize dice at a time so that finished chunks 
+    #can't pile up in memory when they are consumed slower than they are drawn
+    def _IterRollChunks(self, BatchSize):
+        for Start in range(0, self.Dice.Rolls, BatchSize):
+            yield from self._Map(_RollChunk, min(BatchSize, self.Dice.Rolls-Start))
+    
+    #Splits the trials rather than the dice, for patterns with few dice that need to be rolled many times. Chunks still hold at most ChunkSize dice 
+    #(or a single trial if it has more dice than that).
+    def GenerateTrials(self, Trials):
+        if Trials < 0:
+            raise ValueError("Number of trials cannot be negative.")
+        if Trials == 0:
+            return self.Dice.GenerateTrials(0)
+        return numpy.concatenate(list(self._Map(_TrialsChunk, Trials, max(1, self.ChunkSize//self.Dice.Rolls))))
@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import collections
+import threading
+
+class PatternCache(object):
+    """
+    Bounded least recently used cache with hit/miss counters. 
+    Used by Dice.FromCache to keep the parsed state and precomputed tables of the most frequently used patterns.
+    """
+    def __init__(self, MaxSize=1024):
+        if MaxSize < 1:
+            raise ValueError("Cache size must be at least 1.")
+        self.MaxSize = MaxSize
+        self.Hits = 0
+        self.Misses = 0
+        self._Entries = collections.OrderedDict()
+        self._Lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._Entries)
+    
+    def Get(self, Key, CountStats=True):
+        with self._Lock:
+            Value = self._Entries.get(Key)
+            if Value is not None:
+                self._Entries.move_to_end(Key)
+            if CountStats:
+                if Value is None:
+                    self.Misses += 1
+                else:
+                    self.Hits += 1
+            return Value
+    
+    def Put(self, Key, Value):
+        with self._Lock:
+            self._Entries[Key] = Value
+            self._Entries.move_to_end(Key)
+            while len(self._Entries) > self.MaxSize:
+                self._Entries.popitem(last=False)
+    
+    def Resize(self, MaxSize):
+        if MaxSize < 1:
+            raise ValueError("Cache size must be at least 1.")
+        with self._Lock:
+            self.MaxSize = MaxSize
+            while len(self._Entries) > self.MaxSize:
+                self._Entries.popitem(last=False)
+    
+    def Clear(self):
+        with self._Lock:
+            self._Entries.clear()
+            self.Hits = 0
+            self.Misses = 0
+    
+    def GetStats(self):
+        return {'Hits': self.Hits, 'Misses': self.Misses, 'Size': len(self._Entries), 'MaxSize': self.MaxSize}
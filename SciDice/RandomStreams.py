@@ -0,0 +1,40 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import numpy
+
+#Seed can be None (fresh entropy from the OS), an integer, a numpy.random.SeedSequence, a bit generator or an existing numpy.random.Generator (used as is)
+def GetGenerator(Seed=None):
+    if isinstance(Seed, numpy.random.Generator):
+        return Seed
+    return numpy.random.default_rng(Seed)
+
+#Statistically independent child seed sequences, meant to give each worker (thread or process) its own stream.
+#A Generator cannot be spawned from portably across numpy versions, so a seed sequence is derived from its output instead, which keeps the result reproducible.
+def SpawnSeedSequences(Seed, Amount):
+    if isinstance(Seed, numpy.random.Generator):
+        Seed = numpy.random.SeedSequence(Seed.integers(0, 2**63, size=4).tolist())
+    elif not isinstance(Seed, numpy.random.SeedSequence):
+        Seed = numpy.random.SeedSequence(Seed)
+    return Seed.spawn(Amount)
+
+def SpawnGenerators(Seed, Amount):
+    return [numpy.random.default_rng(Child) for Child in SpawnSeedSequences(Seed, Amount)]
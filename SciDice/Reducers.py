@@ -0,0 +1,68 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import numpy
+from SciDice.Selection import SelectExtremes
+
+#Streaming reducers: feed them chunks of rolls (ie, from Dice.IterRolls) with Update and get the reduction of everything seen so far with Result.
+#They only keep O(1), O(Faces) or O(Amount) state, so they can process any amount of rolls with bounded memory.
+
+class RunningSum(object):
+    def __init__(self):
+        self.Total = 0
+    
+    def Update(self, Chunk):
+        self.Total += numpy.sum(Chunk)
+    
+    def Result(self):
+        return self.Total
+
+class RunningBincount(object):
+    def __init__(self, Faces):
+        self.Faces = Faces
+        self.Counts = numpy.zeros(Faces, dtype=numpy.int64)
+    
+    def Update(self, Chunk):
+        self.Counts += numpy.bincount(numpy.ravel(Chunk), minlength=self.Faces+1)[1:]
+    
+    #Result[i] is the number of rolls that were equal to i+1
+    def Result(self):
+        return self.Counts
+
+#Keeps the Amount highest (Descending=True) or lowest rolls seen so far, following the semantics of :>Amount and :<Amount in dice patterns
+#Passing the Faces of the dice lets the selection count dice per face instead of partitioning when the chunks are large
+class RunningKeep(object):
+    def __init__(self, Amount, Descending=True, Faces=None):
+        self.Amount = Amount
+        self.Descending = Descending
+        self.Faces = Faces
+        self.Kept = numpy.zeros(0, dtype=int)
+    
+    def Update(self, Chunk):
+        Candidates = numpy.concatenate((self.Kept, numpy.ravel(Chunk)))
+        if Candidates.size > self.Amount:
+            Candidates = SelectExtremes(Candidates, self.Amount, self.Descending, self.Faces)
+        self.Kept = Candidates
+    
+    #Sorted the same way as the result of a :< or :> pattern
+    def Result(self):
+        Result = numpy.sort(self.Kept)
+        return (Result[::-1] if self.Descending else Result)
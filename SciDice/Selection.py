@@ -0,0 +1,69 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import numpy
+
+#Selection of the Amount highest (Descending=True) or lowest values along the last axis, sorted the same way as the result of a :> or :< pattern.
+#A full sort is O(n*log(n)) per row while only Amount values survive, so larger rows go through cheaper engines:
+#    - Counting: when the values are dice in 1..Faces and Faces is small compared to the row, each row is reduced to the amount of dice on each face, 
+#      which is O(n+Faces), and the kept dice are rebuilt from the counts.
+#    - Partition: numpy.partition (introselect) moves the Amount survivors to one end of the row in O(n) and only they are sorted.
+#Small arrays are still fully sorted, since the fixed cost of the other engines dominates there.
+
+#Below this many values in total, a full sort is the fastest engine
+_MinimumSelectionSize = 4096
+#Rows must be at least this long for partitioning to beat sorting
+_MinimumPartitionLength = 256
+
+def SelectExtremes(Values, Amount, Descending=True, Faces=None):
+    Values = numpy.asarray(Values)
+    Length = Values.shape[-1]
+    if Amount < Length and Values.size >= _MinimumSelectionSize:
+        if Faces is not None and Faces*4 <= Length:
+            return _SelectByCounting(Values, Amount, Descending, Faces)
+        if Amount*4 <= Length and Length >= _MinimumPartitionLength:
+            return _SelectByPartition(Values, Amount, Descending)
+    Result = numpy.sort(Values, axis=-1)
+    if Descending:
+        Result = Result[..., ::-1]
+    return Result[..., :Amount]
+
+def _SelectByPartition(Values, Amount, Descending):
+    Length = Values.shape[-1]
+    if Descending:
+        Result = numpy.partition(Values, Length-Amount, axis=-1)[..., Length-Amount:]
+        Result.sort(axis=-1)
+        return Result[..., ::-1]
+    Result = numpy.partition(Values, Amount-1, axis=-1)[..., :Amount]
+    Result.sort(axis=-1)
+    return Result
+
+#Each row gets its own block of Faces bins, so a single bincount covers all the rows. Dice on previously visited faces are kept first, 
+#so each face keeps whatever is left of the Amount dice.
+def _SelectByCounting(Values, Amount, Descending, Faces):
+    Rows = Values.reshape(-1, Values.shape[-1])
+    Offsets = numpy.arange(0, Rows.shape[0]*Faces, Faces).reshape(-1, 1)
+    Counts = numpy.bincount((Rows-1+Offsets).ravel(), minlength=Rows.shape[0]*Faces).reshape(Rows.shape[0], Faces)
+    Faces = numpy.arange(1, Faces+1, dtype=Values.dtype)
+    if Descending:
+        Faces, Counts = Faces[::-1], Counts[:, ::-1]
+    Counts = numpy.minimum(Counts, numpy.maximum(Amount-(Counts.cumsum(axis=-1)-Counts), 0))
+    return numpy.repeat(numpy.tile(Faces, Rows.shape[0]), Counts.ravel()).reshape(Values.shape[:-1]+(Amount,))
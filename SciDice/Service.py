@@ -0,0 +1,195 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import json
+import time
+import asyncio
+from SciDice.Main import Dice
+from SciDice.PatternCache import PatternCache
+from SciDice.RandomStreams import GetGenerator, SpawnSeedSequences
+
+class RollService(object):
+    """
+    -------------------------------------------------------------------------------------------------------
+    |Usage: Service = RollService(Port=8765); Service.Serve() or, inside an event loop: await Service.Start()|
+    -------------------------------------------------------------------------------------------------------
+    |-> Line-based TCP service: each line received is a pattern and is answered, in order, by a JSON line: {"Result": <Rolls>} or {"Error": <Message>}.
+    |   The line STATS is answered by {"Stats": <GetStats()>}.
+    |
+    |-> Requests for the same pattern arriving within BatchWindow seconds (from any connection) are drawn together with a single call to 
+    |   GenerateTrials and the results are fanned back out, so the per-call overhead of numpy is paid once per batch rather than once per request.
+    |   A batch is drawn early once it reaches MaxBatchSize requests.
+    |
+    |-> Each pattern is rolled by its own Dice instance (kept in a LRU cache of MaxPatterns entries) with a random stream spawned from Seed.
+    |
+    |-> Batches are drawn in the event loop, so the service is meant for the small patterns usually rolled per request (use ParallelDice 
+    |   for huge ones). Patterns of more than MaxRolls dice are answered with an error rather than stalling every connection while they are drawn.
+    |   The remaining keyword arguments (Strategy, Mode) are passed to Dice.
+    """
+    def __init__(self, Host='127.0.0.1', Port=0, BatchWindow=0.002, MaxBatchSize=4096, MaxPatterns=1024, MaxRolls=10000, Seed=None, **Options):
+        if BatchWindow < 0:
+            raise ValueError("Batch window cannot be negative.")
+        if MaxBatchSize < 1:
+            raise ValueError("Maximum batch size must be at least 1.")
+        if MaxRolls < 1:
+            raise ValueError("Maximum amount of rolls must be at least 1.")
+        self.Host = Host
+        self.Port = Port
+        self.BatchWindow = BatchWindow
+        self.MaxBatchSize = MaxBatchSize
+        self.MaxRolls = MaxRolls
+        self.Random = GetGenerator(Seed)
+        self._Options = Options
+        self._Instances = PatternCache(MaxPatterns)
+        self._Pending = {}
+        self._Server = None
+        self.ResetStats()
+    
+    def ResetStats(self):
+        self._StartTime = time.perf_counter()
+        self._Requests = 0
+        self._Errors = 0
+        self._Batches = 0
+        self._TotalLatency = 0.0
+        self._MaxLatency = 0.0
+        self._MaxBatch = 0
+        self._Connections = 0
+    
+    #Latencies go from the time a request is read to the time its result is available, in seconds
+    def GetStats(self):
+        Elapsed = time.perf_counter()-self._StartTime
+        Answered = self._Requests-sum(len(Batch) for Batch in self._Pending.values())
+        return {'Requests': self._Requests, 'Errors': self._Errors, 'Batches': self._Batches, 'Connections': self._Connections,
+                'MeanBatchSize': (Answered/self._Batches if self._Batches > 0 else 0.0), 'MaxBatchSize': self._MaxBatch,
+                'MeanLatency': (self._TotalLatency/Answered if Answered > 0 else 0.0), 'MaxLatency': self._MaxLatency,
+                'RequestsPerSecond': (self._Requests/Elapsed if Elapsed > 0 else 0.0), 'Patterns': len(self._Instances)}
+    
+    def _GetInstance(self, Pattern):
+        Instance = self._Instances.Get(Pattern, CountStats=False)
+        if Instance is None:
+            Instance = Dice.FromCache(Pattern, Seed=SpawnSeedSequences(self.Random, 1)[0], **self._Options)
+            if Instance.Rolls > self.MaxRolls:
+                raise ValueError("Patterns cannot roll more than "+str(self.MaxRolls)+" dice.")
+            self._Instances.Put(Pattern, Instance)
+        return Instance
+    
+    #Future of the rolls of Pattern. Must be called from the event loop of the service.
+    def Roll(self, Pattern):
+        Loop = asyncio.get_running_loop()
+        Future = Loop.create_future()
+        self._Requests += 1
+        Batch = self._Pending.get(Pattern)
+        if Batch is None:
+            Batch = self._Pending[Pattern] = []
+            Loop.call_later(self.BatchWindow, self._Flush, Pattern, Batch)
+        Batch.append((Future, time.perf_counter()))
+        if len(Batch) >= self.MaxBatchSize:
+            self._Flush(Pattern, Batch)
+        return Future
+    
+    #Batch is passed along so that a timer set for a batch that was already drawn (because it was full) doesn't flush the next one early.
+    #Any error is set on every future of the batch: this runs as a callback of the event loop, so an error escaping from it would leave the
+    #requests (and those that follow them on the same connections) unanswered.
+    def _Flush(self, Pattern, Batch):
+        if self._Pending.get(Pattern) is not Batch:
+            return
+        del self._Pending[Pattern]
+        try:
+            Results = self._GetInstance(Pattern).GenerateTrials(len(Batch)).tolist()
+        except Exception as Error:
+            self._Errors += len(Batch)
+            Results = None
+            for Future, Start in Batch:
+                if not Future.done():
+                    Future.set_exception(Error)
+        self._Batches += 1
+        self._MaxBatch = max(self._MaxBatch, len(Batch))
+        End = time.perf_counter()
+        for Index, (Future, Start) in enumerate(Batch):
+            self._TotalLatency += End-Start
+            self._MaxLatency = max(self._MaxLatency, End-Start)
+            if Results is not None and not Future.done():
+                Future.set_result(Results[Index])
+    
+    async def _Answer(self, Line):
+        Pattern = Line.strip()
+        if Pattern == 'STATS':
+            return {'Stats': self.GetStats()}
+        try:
+            return {'Result': await self.Roll(Pattern)}
+        except ValueError as Error:
+            return {'Error': str(Error)}
+        except Exception as Error:
+            return {'Error': type(Error).__name__+(': '+str(Error) if str(Error) else '')}
+    
+    #Lines are read as fast as they arrive and answered in order by a separate writer, so pipelined requests of a connection are batched too
+    async def _HandleConnection(self, Reader, Writer):
+        self._Connections += 1
+        Answers = asyncio.Queue()
+        async def WriteAnswers():
+            while True:
+                Answer = await Answers.get()
+                if Answer is None:
+                    break
+                Writer.write(json.dumps(await Answer).encode('utf-8')+b'\n')
+                if Answers.empty():
+                    await Writer.drain()
+        WriterTask = asyncio.ensure_future(WriteAnswers())
+        try:
+            while True:
+                Line = await Reader.readline()
+                if not Line:
+                    break
+                if Line.strip():
+                    Answers.put_nowait(asyncio.ensure_future(self._Answer(Line.decode('utf-8', 'replace'))))
+            Answers.put_nowait(None)
+            await WriterTask
+        except (ConnectionError, asyncio.CancelledError):
+            WriterTask.cancel()
+        finally:
+            Writer.close()
+    
+    #Port is updated with the port actually bound (ie, when 0 is passed to pick a free one)
+    async def Start(self):
+        self._Server = await asyncio.start_server(self._HandleConnection, self.Host, self.Port)
+        self.Port = self._Server.sockets[0].getsockname()[1]
+        self.ResetStats()
+        return self
+    
+    async def Close(self):
+        if self._Server is not None:
+            self._Server.close()
+            await self._Server.wait_closed()
+            self._Server = None
+    
+    async def _Serve(self):
+        await self.Start()
+        try:
+            await self._Server.serve_forever()
+        finally:
+            await self.Close()
+    
+    #Blocks until interrupted
+    def Serve(self):
+        try:
+            asyncio.run(self._Serve())
+        except KeyboardInterrupt:
+            pass
@@ -24,20 +24,29 @@ import numpy
 import scipy.stats as stats
 from SciDice import Dice
 import SciDice.CustomDistributions as CustomDistributions
+import SciDice.Validation as Validation
 
+#Rolls are streamed in chunks through SciDice.Validation, so memory doesn't depend on the amount of dice. Seeds are fixed to keep the tests deterministic.
+#For a full validation at scale: python -m SciDice.Validation --rolls 1e9 --trials 1e8 --workers <Cores>
 class StatisticalSetup(unittest.TestCase):
     def setUp(self):
-        self.Uniform = Dice("\\1000000d100", False)
-        self.Normal = Dice("\\1000000d100~n(30)", False)
-        self.Exponential = Dice("\\1000000d100~e(0.02)", False)
-        self.Rexponential = Dice("\\1000000d100~re(0.02)", False)
+        self.Uniform = Dice("\\1000000d100", False, Seed=1)
+        self.Normal = Dice("\\1000000d100~n(30)", False, Seed=2)
+        self.Exponential = Dice("\\1000000d100~e(0.02)", False, Seed=3)
+        self.Rexponential = Dice("\\1000000d100~re(0.02)", False, Seed=4)
 
 class GoodnessOfFit(StatisticalSetup):
     def ChiSquareTest(self, Distribution, PValue):
+        Engine = (Distribution.Strategy, Dice.DIRECT_MODE, False)
+        Report = Validation.ValidateDice(Distribution.GeneratorString, Engine, Distribution.Rolls, ChunkSize=2**18, Seed=Distribution.Faces)
+        self.assertEqual(Report['Invalid'], 0)
+        self.assertTrue(Report['ChiSquarePValue']>=PValue)
+        self.assertTrue(Report['KSPValue']>=PValue)
+        #Same statistic, computed in one go on the rolls
         ExpectedFrequencies = Distribution.Pdf*float(Distribution.Rolls)
-        ObservedFrequencies = numpy.bincount(Distribution.GenerateRolls()-1).astype(numpy.float)
+        ObservedFrequencies = numpy.bincount(Distribution.GenerateRolls()-1, minlength=Distribution.Faces).astype(float)
         T = (numpy.square(ObservedFrequencies-ExpectedFrequencies)/ExpectedFrequencies).sum()
-        self.assertTrue(stats.chisqprob(T, Distribution.Faces-1)>=PValue)
+        self.assertTrue(stats.chi2.sf(T, Distribution.Faces-1)>=PValue)
 
     def test_UniformChiSquare(self):
         self.ChiSquareTest(self.Uniform, 0.01)
@@ -51,5 +60,28 @@ class GoodnessOfFit(StatisticalSetup):
     def test_RexponentialChiSquare(self):
         self.ChiSquareTest(self.Rexponential, 0.01)
 
+class EngineValidation(unittest.TestCase):
+    #Every strategy, mode and low-memory variant, for the dice and for the summed and :<|> results against their exact distributions
+    def test_AllEngines(self):
+        Reports = Validation.RunValidation(Validation.Patterns, Rolls=2*10**6, Trials=2*10**5, ChunkSize=2**19, Workers=2, Seed=2014)
+        self.assertTrue(len(Reports) > len(Validation.Patterns))
+        for Report in Reports:
+            self.assertTrue(Report['Passed'], Report)
+    
+    #A sampler drawing from a slightly wrong distribution must be caught
+    def test_Sensitivity(self):
+        Pdf = Dice("1d20~n(10,5)", False).Pdf
+        Shifted = numpy.roll(Pdf, 1)
+        Counts = numpy.random.default_rng(1).multinomial(10**7, Shifted/Shifted.sum())
+        self.assertTrue(Validation.ChiSquareTest(Counts, Pdf) < 1e-10)
+        self.assertTrue(Validation.KSTest(Counts, Pdf) < 1e-10)
+        Biased = Pdf.copy()
+        Biased[[0, -1]] *= 1.01
+        Counts = numpy.random.default_rng(2).multinomial(10**9, Biased/Biased.sum())
+        self.assertTrue(Validation.ChiSquareTest(Counts, Pdf) < 1e-4)
+        self.assertEqual(Validation.ChiSquareTest(numpy.array([5, 5, 1]), numpy.array([0.5, 0.5, 0.0])), 0.0)
+        Counts, Invalid = Validation._Bincount(numpy.array([0, 1, 2, 2, 7]), 1, 6)
+        self.assertEqual((Counts.tolist(), Invalid), ([[1, 2, 0, 0, 0, 0]], 2))
+
 if __name__ == '__main__':
     unittest.main()
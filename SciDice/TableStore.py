@@ -0,0 +1,137 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import numpy
+from SciDice import __version__
+
+#Version of the layout of the stored tables and of the algorithms that compute them (ie, RangeConditionalCdf, SumPdf, KeptSumPdf and AliasTable).
+#It must be bumped whenever one of them changes, even between releases of the library, or stores would keep serving tables computed by the previous code.
+TABLE_FORMAT_VERSION = 1
+#Names of the directories of the versions (<library version>-<TABLE_FORMAT_VERSION>) and of the keys (sha1 hashes) in them
+_VersionDirectoryRegex = re.compile(r'^\d+(\.\d+)*[0-9A-Za-z.+]*-\d+$')
+_KeyDirectoryRegex = re.compile(r'^[0-9a-f]{40}$')
+
+class TableStore(object):
+    """
+    On-disk store of precomputed tables (see Dice.SetTableStore), so that processes can skip computing them when they start.
+    
+    |-> Tables are saved as .npy files under <Directory>/<library version>-<TABLE_FORMAT_VERSION>/<hash of the key>/<table name>.npy and opened 
+    |   with numpy.load(mmap_mode='r'), so processes that load the same table share the same memory pages.
+    |
+    |-> Files are written to a temporary file and renamed, so concurrent readers never see a partial table.
+    |
+    |-> If MaxBytes is set, the least recently used tables are deleted once the tables of the current version exceed it.
+    |
+    |-> Changing the library version or TABLE_FORMAT_VERSION invalidates every table. Invalidate removes the tables of a key (or all of them) and RemoveStaleVersions 
+    |   removes the directories of other versions. Anything else in <Directory> is left alone, so it can be shared with other data.
+    """
+    def __init__(self, Directory, MaxBytes=None):
+        if MaxBytes is not None and MaxBytes < 0:
+            raise ValueError("Maximum size cannot be negative.")
+        self.Directory = Directory
+        self.MaxBytes = MaxBytes
+        self.Version = __version__+'-'+str(TABLE_FORMAT_VERSION)
+        self.VersionDirectory = os.path.join(Directory, self.Version)
+        self._Lock = threading.Lock()
+        os.makedirs(self.VersionDirectory, exist_ok=True)
+    
+    #Keys can contain characters that are not allowed in file names (ie, '\' or ':'), so they are hashed
+    def _GetKeyDirectory(self, Key):
+        return os.path.join(self.VersionDirectory, hashlib.sha1((self.Version+'/'+Key).encode('utf-8')).hexdigest())
+    
+    def _GetPath(self, Key, Name):
+        return os.path.join(self._GetKeyDirectory(Key), Name+'.npy')
+    
+    #Read-only array mapped on the stored table or None if it isn't stored. The modification time is used to track the least recently used tables.
+    def Get(self, Key, Name):
+        Path = self._GetPath(Key, Name)
+        try:
+            Table = numpy.load(Path, mmap_mode='r')
+            os.utime(Path)
+        except (OSError, ValueError):
+            return None
+        return Table.view(numpy.ndarray)
+    
+    def Put(self, Key, Name, Table):
+        Directory = self._GetKeyDirectory(Key)
+        os.makedirs(Directory, exist_ok=True)
+        Handle, TemporaryPath = tempfile.mkstemp(dir=Directory, suffix='.tmp')
+        try:
+            with os.fdopen(Handle, 'wb') as File:
+                numpy.save(File, numpy.ascontiguousarray(Table))
+            os.replace(TemporaryPath, self._GetPath(Key, Name))
+        except BaseException:
+            os.remove(TemporaryPath)
+            raise
+        if self.MaxBytes is not None:
+            self._Evict()
+    
+    def _ListTables(self):
+        Tables = []
+        for Root, Directories, Files in os.walk(self.VersionDirectory):
+            for File in Files:
+                if File.endswith('.npy'):
+                    try:
+                        Stats = os.stat(os.path.join(Root, File))
+                    except OSError:
+                        continue
+                    Tables.append((Stats.st_mtime, Stats.st_size, os.path.join(Root, File)))
+        return Tables
+    
+    def GetSize(self):
+        return sum(Size for Time, Size, Path in self._ListTables())
+    
+    #Deleting a file doesn't affect processes that already mapped it, so tables can be evicted while in use
+    def _Evict(self):
+        with self._Lock:
+            Tables = sorted(self._ListTables())
+            Total = sum(Size for Time, Size, Path in Tables)
+            while Tables and Total > self.MaxBytes:
+                Time, Size, Path = Tables.pop(0)
+                try:
+                    os.remove(Path)
+                except OSError:
+                    continue
+                Total -= Size
+    
+    def Invalidate(self, Key=None):
+        Directory = (self.VersionDirectory if Key is None else self._GetKeyDirectory(Key))
+        shutil.rmtree(Directory, ignore_errors=True)
+        os.makedirs(self.VersionDirectory, exist_ok=True)
+    
+    #Only the directories named and laid out like the ones of a store are removed
+    def RemoveStaleVersions(self):
+        for Entry in os.listdir(self.Directory):
+            Path = os.path.join(self.Directory, Entry)
+            if Entry != self.Version and _VersionDirectoryRegex.match(Entry) and self._IsVersionDirectory(Path):
+                shutil.rmtree(Path, ignore_errors=True)
+    
+    @staticmethod
+    def _IsVersionDirectory(Path):
+        if os.path.islink(Path) or not(os.path.isdir(Path)):
+            return False
+        return all(_KeyDirectoryRegex.match(Entry) and os.path.isdir(os.path.join(Path, Entry)) and not(os.path.islink(os.path.join(Path, Entry))) for Entry in os.listdir(Path))
@@ -0,0 +1,187 @@
+"""
+Copyright (c) 2014 Eric Vallee <eric_vallee2003@yahoo.ca>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import sys
+import argparse
+import concurrent.futures
+import numpy
+from SciDice.Main import Dice
+from SciDice.RandomStreams import SpawnSeedSequences
+
+#Usage: python -m SciDice.Validation [--rolls <Dice per engine>] [--trials <Results per engine>] [--workers <Processes>] [--pattern <Pattern>]
+#Checks that every sampling engine (strategy, mode and low-memory mode) of each pattern draws from the right distribution:
+#    - the faces of individual dice are tested against self.Pdf
+#    - the results of summed and :<|> patterns are tested against the exact distribution from GetResultDistribution
+#Dice are drawn in chunks of at most ChunkSize dice in a pool of worker processes and only their bincounts are sent back and accumulated, 
+#so memory doesn't depend on the amount of dice and 10^9 dice or more can be checked per engine.
+
+Patterns = ("1d20", "\\10d100", "\\10d100~n(30)", "\\10d100~e(0.02)", "\\10d100~re(0.02)", "\\10d6:>3~n(3,2)", "10d6", "10d6:>3", "4d8:<2~e(0.25)", "40d20~n(10,5)")
+
+#(Strategy, Mode, LowMemory) tuples: every supported strategy in direct and low-memory mode, then the modes that derive results differently
+def GetEngines(Pattern):
+    Instance = Dice(Pattern)
+    Engines = [(Strategy, Dice.DIRECT_MODE, LowMemory) for Strategy in Dice._SupportedStrategies[Instance.Distribution] for LowMemory in (False, True)]
+    if Instance.Rolls > 1 and (Instance.Sum or Instance.HighLowAmount > 0):
+        Engines.append((Dice.AUTO_STRATEGY, Dice.HISTOGRAM_MODE, False))
+    if Instance.Rolls > 1 and Instance.Sum:
+        Engines.append((Dice.AUTO_STRATEGY, Dice.SUM_TABLE_MODE, False))
+    return Engines
+
+#Executed in the worker processes. Dice.FromCache makes sure tables are only computed once per worker.
+def _GetInstance(Pattern, Engine, SeedSequence):
+    Strategy, Mode, LowMemory = Engine
+    Instance = Dice.FromCache(Pattern, Strategy=Strategy, Mode=Mode, Seed=SeedSequence)
+    if LowMemory:
+        Instance.EnableLowMemory()
+    return Instance
+
+#Bincount of Values-Offset over Size bins along the last axis (one row per position for array results), with the amount of values out of range
+def _Bincount(Values, Offset, Size):
+    Indexes = (Values.T if Values.ndim > 1 else Values.reshape(1, -1)).astype(numpy.int64)-Offset
+    Valid = (Indexes >= 0) & (Indexes < Size)
+    Indexes = Indexes+numpy.arange(Indexes.shape[0]).reshape(-1, 1)*Size
+    Counts = numpy.bincount(Indexes[Valid], minlength=Indexes.shape[0]*Size).reshape(Indexes.shape[0], Size)
+    return Counts, int(Valid.size-Valid.sum())
+
+def _CountDice(Pattern, Engine, SeedSequence, Size):
+    Instance = _GetInstance(Pattern, Engine, SeedSequence)
+    return _Bincount(Instance._GenerateRolls(Size), 1, Instance.Faces)
+
+def _CountResults(Pattern, Engine, SeedSequence, Size):
+    Instance = _GetInstance(Pattern, Engine, SeedSequence)
+    Values, Pmf = Instance.GetResultDistribution()
+    return _Bincount(Instance.GenerateTrials(Size), Values[0], Values.size)
+
+#Pool of Workers processes or None to work in the current process
+def _GetPool(Workers):
+    return (concurrent.futures.ProcessPoolExecutor(max_workers=Workers) if Workers > 1 else None)
+
+#Calls Function on chunks of Amount (each with its own random stream) in Pool and adds up the counts as they come back
+def _Accumulate(Function, Pattern, Engine, Amount, ChunkSize, Pool, Seed):
+    Sizes = [ChunkSize]*(Amount//ChunkSize)+([Amount % ChunkSize] if Amount % ChunkSize > 0 else [])
+    Arguments = ([Pattern]*len(Sizes), [Engine]*len(Sizes), SpawnSeedSequences(Seed, len(Sizes)), Sizes)
+    Total, Invalid = None, 0
+    for Counts, ChunkInvalid in (map if Pool is None else Pool.map)(Function, *Arguments):
+        Total = (Counts if Total is None else Total+Counts)
+        Invalid += ChunkInvalid
+    return Total, Invalid
+
+def _Run(Function, Pattern, Engine, Amount, ChunkSize, Workers, Seed, Pool):
+    if Pool is not None:
+        return _Accumulate(Function, Pattern, Engine, Amount, ChunkSize, Pool, Seed)
+    Pool = _GetPool(Workers)
+    try:
+        return _Accumulate(Function, Pattern, Engine, Amount, ChunkSize, Pool, Seed)
+    finally:
+        if Pool is not None:
+            Pool.shutdown()
+
+#P-value of Pearson's chi-square test of Observed counts against the probabilities Pmf. Bins expecting fewer than MinimumExpected counts are pooled 
+#together and a count in a bin of null probability gives a p-value of 0.
+def ChiSquareTest(Observed, Pmf, MinimumExpected=5.0):
+    from scipy.stats import chi2
+    Total = Observed.sum()
+    Expected = Pmf*(Total/Pmf.sum())
+    if (Observed[Expected <= 0.0] > 0).any():
+        return 0.0
+    Small = Expected < MinimumExpected
+    Observed = numpy.append(Observed[~Small], Observed[Small].sum())
+    Expected = numpy.append(Expected[~Small], Expected[Small].sum())
+    Kept = Expected > 0.0
+    Observed, Expected = Observed[Kept], Expected[Kept]
+    if Expected.size < 2:
+        return 1.0
+    return float(chi2.sf((numpy.square(Observed-Expected)/Expected).sum(), Expected.size-1))
+
+#P-value of the Kolmogorov-Smirnov test of Observed counts against the probabilities Pmf, from the asymptotic distribution of the statistic.
+#It is conservative for discrete distributions, but catches shifts of the whole distribution that the chi-square test spreads over many bins.
+def KSTest(Observed, Pmf):
+    from scipy.stats import kstwobign
+    Total = Observed.sum()
+    Statistic = numpy.abs(Observed.cumsum()/float(Total)-Pmf.cumsum()/Pmf.sum()).max()
+    return float(kstwobign.sf(Statistic*numpy.sqrt(Total)))
+
+#For array results, each position is tested against its own marginal distribution and the smallest p-value, multiplied by the number of positions 
+#(Bonferroni correction), is reported
+def _Test(Counts, Pmf, Invalid):
+    Pmf = numpy.asarray(Pmf).reshape(Counts.shape[0], -1)
+    Positions = Counts.shape[0]
+    ChiSquare = min(1.0, Positions*min(ChiSquareTest(Row, Probabilities) for Row, Probabilities in zip(Counts, Pmf)))
+    KS = min(1.0, Positions*min(KSTest(Row, Probabilities) for Row, Probabilities in zip(Counts, Pmf)))
+    if Invalid > 0:
+        ChiSquare = KS = 0.0
+    return {'Samples': int(Counts.sum())+Invalid, 'Invalid': Invalid, 'ChiSquarePValue': ChiSquare, 'KSPValue': KS}
+
+#Tests Amount dice of the pattern's die drawn by Engine against self.Pdf. 
+#Chunks are drawn in Pool (a concurrent.futures executor) if it is passed and in a new pool of Workers processes otherwise.
+def ValidateDice(Pattern, Engine, Amount, ChunkSize=2**22, Workers=1, Seed=None, Pool=None):
+    Counts, Invalid = _Run(_CountDice, Pattern, Engine, Amount, ChunkSize, Workers, Seed, Pool)
+    return _Test(Counts, Dice(Pattern, LightConstructor=False).Pdf, Invalid)
+
+#Tests Trials results of the pattern drawn by Engine against the exact distribution of the result. Chunks hold at most ChunkSize dice.
+def ValidateResults(Pattern, Engine, Trials, ChunkSize=2**22, Workers=1, Seed=None, Pool=None):
+    Reference = Dice(Pattern, LightConstructor=False)
+    Counts, Invalid = _Run(_CountResults, Pattern, Engine, Trials, max(1, ChunkSize//Reference.Rolls), Workers, Seed, Pool)
+    return _Test(Counts, Reference.GetResultDistribution()[1], Invalid)
+
+#Validates every engine of each pattern, each test with its own random stream. Results of unsummed patterns without :<|> are the dice themselves, 
+#so they are only tested once. Each report is flagged as failed if one of its p-values is below Alpha.
+def RunValidation(Patterns, Rolls=10**7, Trials=10**6, ChunkSize=2**22, Workers=1, Seed=None, Alpha=1e-4):
+    Reports = []
+    Seeds = numpy.random.SeedSequence(Seed)
+    Pool = _GetPool(Workers)
+    try:
+        for Pattern in Patterns:
+            Instance = Dice(Pattern)
+            for Engine in GetEngines(Pattern):
+                Tests = []
+                if Engine[1] == Dice.DIRECT_MODE and Rolls > 0:
+                    Tests.append(('Dice', ValidateDice(Pattern, Engine, Rolls, ChunkSize, Seed=Seeds.spawn(1)[0], Pool=Pool)))
+                if (Instance.Sum or Instance.HighLowAmount > 0) and Trials > 0:
+                    Tests.append(('Results', ValidateResults(Pattern, Engine, Trials, ChunkSize, Seed=Seeds.spawn(1)[0], Pool=Pool)))
+                for Test, Report in Tests:
+                    Report.update({'Pattern': Pattern, 'Strategy': Engine[0], 'Mode': Engine[1], 'LowMemory': Engine[2], 'Test': Test,
+                                   'Passed': min(Report['ChiSquarePValue'], Report['KSPValue']) >= Alpha})
+                    Reports.append(Report)
+    finally:
+        if Pool is not None:
+            Pool.shutdown()
+    return Reports
+
+def main(Arguments=None):
+    Parser = argparse.ArgumentParser(prog='python -m SciDice.Validation', description='Checks the distribution of the rolls of every SciDice sampling engine.')
+    Parser.add_argument('--pattern', action='append', help='Validate this pattern instead of the default ones (can be repeated).')
+    Parser.add_argument('--rolls', type=float, default=1e7, help='Dice drawn per engine to test the faces (ie, 1e9).')
+    Parser.add_argument('--trials', type=float, default=1e6, help='Results drawn per engine to test summed and :<|> results.')
+    Parser.add_argument('--chunk-size', type=int, default=2**22, help='Maximum amount of dice drawn at once by a worker.')
+    Parser.add_argument('--workers', type=int, default=1, help='Number of worker processes.')
+    Parser.add_argument('--seed', type=int, help='Seed of the random streams.')
+    Parser.add_argument('--alpha', type=float, default=1e-4, help='P-value below which an engine fails.')
+    Options = Parser.parse_args(Arguments)
+    Reports = RunValidation(Options.pattern or Patterns, int(Options.rolls), int(Options.trials), Options.chunk_size, Options.workers, Options.seed, Options.alpha)
+    for Report in Reports:
+        print("%-20s %-10s %-10s %-5s %-7s %12d samples  chi2 p=%.3e  KS p=%.3e  %s" % (Report['Pattern'], Report['Strategy'], Report['Mode'], 
+              ('low' if Report['LowMemory'] else ''), Report['Test'], Report['Samples'], Report['ChiSquarePValue'], Report['KSPValue'], 
+              ('ok' if Report['Passed'] else 'FAILED')))
+    return (0 if all(Report['Passed'] for Report in Reports) else 1)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,5 +19,10 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
+__version__ = '1.0.0'
+
 from SciDice.Main import Dice
-__all__ = ['Dice']
+from SciDice.Parallel import ParallelDice
+from SciDice.Expressions import DiceExpression
+from SciDice.TableStore import TableStore
+__all__ = ['Dice', 'ParallelDice', 'DiceExpression', 'TableStore']